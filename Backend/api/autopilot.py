@@ -2,28 +2,45 @@
 
 import asyncio
 import base64
-import json
+import hashlib
 import logging
 import os
 import uuid
 import re
 import html
-from typing import Optional
+import json
+import tempfile
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import AsyncIterator, NamedTuple, Optional
 
+from dateparser.date import DateDataParser
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from chat.autopilot_extractor import extract_autopilot_json, get_openai_client
 from chat.calendar_extractor import extract_calendar_event
 from chat.reply_drafter import generate_reply_draft
-from rag.retrieve import retrieve
+from rag import semantic_cache
+from rag.retrieve import reload_store, retrieve
 from actions.dispatcher import dry_run_action, execute_action
+from rag.ingest import ingest_knowledge_base
+from store.run_queue import flush_runs
 from store.runs import create_run, update_run, get_run, list_runs
+from utils.datetime_fmt import is_iso_date, normalise_time as _resolve_time
+from utils.timezone import now as now_toronto
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/autopilot", tags=["autopilot"])
 
+_TRANSCRIPT_CACHE_MAX = 256
+# Drafts longer than this are rendered to HTML in a worker thread
+_EMAIL_OFFLOAD_CHARS = 2048
+_transcript_cache: OrderedDict[str, str] = OrderedDict()
+
 
 # --- Request / Response Models ---
 
@@ -51,9 +68,58 @@ class AutopilotAdjustRequest(BaseModel):
 
 @router.post("/run")
 async def autopilot_run(req: AutopilotRunRequest):
-    run_id = str(uuid.uuid4())
+    run_id = uuid.uuid4().hex
+    _start_run(run_id, req)
 
-    # Determine input
+    result = {"run_id": run_id}
+    try:
+        async for _step, data in _run_pipeline(run_id, req):
+            result.update(data)
+        return result
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        update_run(run_id, status="error", error=str(e)[:1000])
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.exception("[%s] Autopilot run error", run_id)
+        update_run(run_id, status="error", error=str(e)[:1000])
+        raise HTTPException(status_code=500, detail=f"Internal error: {str(e)[:200]}")
+
+
+# --- POST /autopilot/run/stream ---
+
+@router.post("/run/stream")
+async def autopilot_run_stream(req: AutopilotRunRequest):
+    """Same pipeline as /run, emitted as Server-Sent Events as each step completes."""
+    run_id = uuid.uuid4().hex
+    _start_run(run_id, req)
+
+    async def event_stream():
+        yield _sse_event("started", {"run_id": run_id})
+        try:
+            async for step, data in _run_pipeline(run_id, req, stream_draft=True):
+                yield _sse_event(step, {"run_id": run_id, **data})
+        except HTTPException as e:
+            yield _sse_event("error", {"run_id": run_id, "status_code": e.status_code, "detail": e.detail})
+        except ValueError as e:
+            update_run(run_id, status="error", error=str(e)[:1000])
+            yield _sse_event("error", {"run_id": run_id, "status_code": 422, "detail": str(e)})
+        except Exception as e:
+            logger.exception("[%s] Autopilot run error", run_id)
+            update_run(run_id, status="error", error=str(e)[:1000])
+            yield _sse_event("error", {"run_id": run_id, "status_code": 500, "detail": f"Internal error: {str(e)[:200]}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _start_run(run_id: str, req: AutopilotRunRequest) -> None:
+    """Validate the run input and record the run before any pipeline work starts."""
     if req.mode == "audio":
         if not req.audio_base64:
             raise HTTPException(status_code=400, detail="audio_base64 is required for audio mode")
@@ -67,86 +133,160 @@ async def autopilot_run(req: AutopilotRunRequest):
 
     create_run(run_id, req.mode, raw_input or "", run_type="autopilot")
 
+
+async def _stream_reply_draft(client, transcript, extracted, evidence, run_id) -> AsyncIterator[str | dict]:
+    """Yield reply_text pieces while the draft streams, then the finished draft dict."""
+    pieces: asyncio.Queue[str] = asyncio.Queue()
+    draft_task = asyncio.create_task(generate_reply_draft(
+        client, transcript, extracted, evidence, run_id=run_id, on_text=pieces.put_nowait,
+    ))
+    get_task = None
     try:
-        # Step 1: Transcription
-        transcript = ""
-        if req.mode == "audio":
-            transcript = await _transcribe_audio(req.audio_base64, lang=_normalize_lang(req.locale))
-        else:
-            transcript = req.text.strip()
+        while not draft_task.done():
+            get_task = asyncio.ensure_future(pieces.get())
+            done, _ = await asyncio.wait({get_task, draft_task}, return_when=asyncio.FIRST_COMPLETED)
+            if get_task in done:
+                yield get_task.result()
+            else:
+                get_task.cancel()
+        while not pieces.empty():
+            yield pieces.get_nowait()
+        yield draft_task.result()
+    finally:
+        # The consumer may stop early (client disconnected)
+        if get_task is not None:
+            get_task.cancel()
+        draft_task.cancel()
+
+
+def _sse_event(step: str, data: dict) -> str:
+    return f"event: {step}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def _run_pipeline(
+    run_id: str,
+    req: AutopilotRunRequest,
+    *,
+    stream_draft: bool = False,
+) -> AsyncIterator[tuple[str, dict]]:
+    """
+    Run the autopilot steps, yielding (step, data) as each one is persisted.
+    Merging the yielded dicts in order gives the /run response body.
+    With stream_draft, "draft_delta" events carry reply_text pieces before "drafted".
+    """
+    # Step 1: Transcription
+    transcript = ""
+    if req.mode == "audio":
+        transcript = await _transcribe_audio(req.audio_base64, lang=_normalize_lang(req.locale))
+    else:
+        transcript = req.text.strip()
 
-        if not transcript:
-            raise HTTPException(status_code=400, detail="Empty transcript")
+    if not transcript:
+        raise HTTPException(status_code=400, detail="Empty transcript")
 
-        update_run(run_id, transcript=transcript, status="transcribed")
+    update_run(run_id, transcript=transcript, status="transcribed")
+    yield "transcribed", {"transcript": transcript}
 
+    client = get_openai_client()
+
+    # Near-duplicate transcripts reuse the previous extraction/evidence/draft.
+    # Extraction starts alongside the cache lookup so a miss costs no extra round-trip.
+    cache_embedding = None
+    cached = None
+    extract_task = None
+    if semantic_cache.is_cacheable(transcript):
+        extract_task = asyncio.create_task(extract_autopilot_json(transcript, run_id=run_id))
+        try:
+            cache_embedding = await semantic_cache.embed_text(transcript, client)
+            cached = semantic_cache.lookup(cache_embedding)
+        except asyncio.CancelledError:
+            extract_task.cancel()
+            raise
+        except Exception as e:
+            # The cache is only an optimization; fall through to the extraction already running
+            logger.warning("[%s] Semantic cache lookup failed: %s", run_id, e)
+            cache_embedding = None
+        if cached:
+            extract_task.cancel()
+
+    if cached:
+        extracted, evidence, draft = cached["extracted"], cached["evidence"], cached["draft"]
+        update_run(run_id, extracted_json=extracted, status="extracted")
+        yield "extracted", {"extracted": extracted}
+        update_run(run_id, evidence_json=evidence)
+        yield "evidence", {"evidence": evidence}
+    else:
         # Step 2: Extraction via Tool Calling
-        extracted = await extract_autopilot_json(transcript, run_id=run_id)
+        if extract_task is not None:
+            extracted = await extract_task
+        else:
+            extracted = await extract_autopilot_json(transcript, run_id=run_id)
         update_run(run_id, extracted_json=extracted, status="extracted")
+        yield "extracted", {"extracted": extracted}
 
         # Step 3: RAG retrieval
-        client = get_openai_client()
         query = _build_rag_query(extracted)
         evidence = await retrieve(query, client)
         update_run(run_id, evidence_json=evidence)
+        yield "evidence", {"evidence": evidence}
 
         # Step 4: Reply draft
-        draft = await generate_reply_draft(client, transcript, extracted, evidence, run_id=run_id)
+        if stream_draft:
+            draft = None
+            async for piece in _stream_reply_draft(client, transcript, extracted, evidence, run_id):
+                if isinstance(piece, str):
+                    yield "draft_delta", {"text": piece}
+                else:
+                    draft = piece
+        else:
+            draft = await generate_reply_draft(client, transcript, extracted, evidence, run_id=run_id)
 
-        # Build email_content only if there's potential for email action
-        entities = extracted.get("entities") or {}
-        has_email = bool(entities.get("email"))
-        email_content = None
-        if has_email:
-            email_content = _build_email_content(draft, extracted)
+        if cache_embedding is not None:
+            semantic_cache.store(cache_embedding, {"extracted": extracted, "evidence": evidence, "draft": draft})
 
-        reply_payload = {
-            "text": draft.get("reply_text", ""),
-            "reply_text": draft.get("reply_text", ""),
-            "citations": draft.get("citations", []),
-            "html": email_content.get("body_html", "") if email_content else "",
-            "subject": email_content.get("subject", "") if email_content else "",
-            "to": email_content.get("to", "") if email_content else "",
-            "from": email_content.get("from_display", "") if email_content else "",
-            "body_text": email_content.get("body_text", "") if email_content else "",
-        }
-        update_run(run_id, reply_draft=reply_payload, status="drafted")
-
-        # Step 5: Enrich & filter actions, then dry_run preview (parallelized)
-        actions = extracted.get("next_best_actions", [])
-        actions = await _enrich_actions(actions, extracted, draft, email_content, transcript)
-
-        # Parallel dry_run for all actions
-        preview_tasks = [dry_run_action(action) for action in actions]
-        previews = await asyncio.gather(*preview_tasks)
-
-        actions_preview = []
-        for action, preview in zip(actions, previews):
-            actions_preview.append({
-                **action,
-                "preview": preview.get("preview", ""),
-            })
-        update_run(run_id, actions_json=actions_preview, status="previewed")
-        view_extracted = _merge_extracted_actions(extracted, actions)
-
-        return {
-            "run_id": run_id,
-            "transcript": transcript,
-            "extracted": view_extracted,
-            "evidence": evidence,
-            "reply_draft": reply_payload,
-            "actions_preview": actions_preview,
-        }
+    # Build email_content only if there's potential for email action
+    entities = extracted.get("entities") or {}
+    has_email = bool(entities.get("email"))
+    email_content = None
+    if has_email:
+        if len(draft.get("reply_text") or "") > _EMAIL_OFFLOAD_CHARS:
+            email_content = await asyncio.to_thread(_build_email_content, draft, extracted)
+        else:
+            email_content = _build_email_content(draft, extracted)
 
-    except HTTPException:
-        raise
-    except ValueError as e:
-        update_run(run_id, status="error", error=str(e)[:1000])
-        raise HTTPException(status_code=422, detail=str(e))
-    except Exception as e:
-        logger.exception("[%s] Autopilot run error", run_id)
-        update_run(run_id, status="error", error=str(e)[:1000])
-        raise HTTPException(status_code=500, detail=f"Internal error: {str(e)[:200]}")
+    reply_payload = {
+        "text": draft.get("reply_text", ""),
+        "reply_text": draft.get("reply_text", ""),
+        "citations": draft.get("citations", []),
+        "html": email_content.get("body_html", "") if email_content else "",
+        "subject": email_content.get("subject", "") if email_content else "",
+        "to": email_content.get("to", "") if email_content else "",
+        "from": email_content.get("from_display", "") if email_content else "",
+        "body_text": email_content.get("body_text", "") if email_content else "",
+    }
+    update_run(run_id, reply_draft=reply_payload, status="drafted")
+    yield "drafted", {"reply_draft": reply_payload}
+
+    # Step 5: Enrich & filter actions, then dry_run preview (parallelized)
+    actions = extracted.get("next_best_actions", [])
+    actions = await _enrich_actions(actions, extracted, draft, email_content, transcript)
+
+    # Parallel dry_run for all actions; one failing preview must not sink the run
+    preview_tasks = [dry_run_action(action) for action in actions]
+    previews = await asyncio.gather(*preview_tasks, return_exceptions=True)
+
+    actions_preview = []
+    for action, preview in zip(actions, previews):
+        if isinstance(preview, Exception):
+            logger.warning("[%s] dry_run failed for %s: %s", run_id, action.get("action_type"), preview)
+            preview = {"preview": ""}
+        actions_preview.append({
+            **action,
+            "preview": preview.get("preview", ""),
+        })
+    update_run(run_id, actions_json=actions_preview, status="previewed")
+    view_extracted = _merge_extracted_actions(extracted, actions)
+    yield "previewed", {"extracted": view_extracted, "actions_preview": actions_preview}
 
 
 # --- POST /autopilot/confirm ---
@@ -183,7 +323,6 @@ async def autopilot_confirm(req: AutopilotConfirmRequest):
     calendar_success = True
     confirmation_text = ""
     confirmation_html = ""
-    from utils.timezone import now as now_toronto
     current_dt = now_toronto()
 
     if calendar_indices:
@@ -229,8 +368,9 @@ async def autopilot_confirm(req: AutopilotConfirmRequest):
                         "status": "skipped",
                         "result": {"reason": "Calendar not created yet"},
                     }
-    # If no calendar action or calendar succeeded, execute remaining actions in order
+    # If no calendar action or calendar succeeded, execute remaining actions concurrently
     if not calendar_indices or calendar_success:
+        pending: list[tuple[int, str, dict]] = []
         for m in action_meta:
             idx = m["idx"]
             action = m["action"]
@@ -257,12 +397,19 @@ async def autopilot_confirm(req: AutopilotConfirmRequest):
                 _append_confirmation_to_email_payload(payload, confirmation_text, confirmation_html)
                 action = {**action, "payload": payload}
 
-            try:
-                result = await execute_action(action, lang=locale)
-                results_by_index[idx] = result
-            except Exception as e:
-                logger.exception("Action execution error for %s", action_type)
-                results_by_index[idx] = {"action_type": action_type, "status": "failed", "result": {"error": str(e)[:300]}}
+            pending.append((idx, action_type, action))
+
+        # Slack/email/ticket calls are independent network I/O
+        outcomes = await asyncio.gather(
+            *(execute_action(action, lang=locale) for _, _, action in pending),
+            return_exceptions=True,
+        )
+        for (idx, action_type, _), outcome in zip(pending, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error("Action execution error for %s: %s", action_type, outcome, exc_info=outcome)
+                results_by_index[idx] = {"action_type": action_type, "status": "failed", "result": {"error": str(outcome)[:300]}}
+            else:
+                results_by_index[idx] = outcome
 
     # Preserve original order of results
     for i in range(len(actions)):
@@ -337,9 +484,9 @@ async def autopilot_adjust_time(req: AutopilotAdjustRequest):
 @router.post("/ingest")
 async def autopilot_ingest():
     """Re-ingest the knowledge base into the FAISS index."""
-    from rag.ingest import ingest_knowledge_base
     client = get_openai_client()
     result = await ingest_knowledge_base(client)
+    await reload_store()
     return {"status": "ok", **result}
 
 
@@ -355,6 +502,7 @@ async def get_autopilot_runs(limit: int = 50, offset: int = 0, run_type: Optiona
     if run_type and run_type not in ("autopilot", "voice_schedule"):
         raise HTTPException(status_code=400, detail="run_type must be 'autopilot' or 'voice_schedule'")
 
+    await flush_runs()
     runs = list_runs(limit=limit, offset=offset, run_type=run_type)
     return {"runs": runs, "limit": limit, "offset": offset, "run_type": run_type}
 
@@ -364,7 +512,12 @@ async def get_autopilot_runs(limit: int = 50, offset: int = 0, run_type: Optiona
 @router.get("/runs/{run_id}")
 async def get_autopilot_run_detail(run_id: str):
     """Get detailed information about a specific autopilot run."""
+    lost = await flush_runs()
     run = get_run(run_id)
+    if run_id in lost:
+        if not run:
+            raise HTTPException(status_code=500, detail=f"Run {run_id} could not be persisted")
+        run["writes_lost"] = True  # some updates were dropped, so fields may be stale
     if not run:
         raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
     return run
@@ -410,7 +563,6 @@ async def autopilot_retry(run_id: str):
 
     # Execute retry actions
     results = list(previous_actions)  # Copy previous results
-    from utils.timezone import now as now_toronto
     current_dt = now_toronto()
 
     for idx, action in actions_to_retry:
@@ -443,24 +595,48 @@ async def autopilot_retry(run_id: str):
 # --- Helpers ---
 
 async def _transcribe_audio(audio_b64: str, lang: str = "en") -> str:
-    """Decode base64 audio and run Whisper STT."""
-    import tempfile
+    """Decode base64 audio and run Whisper STT off the event loop.
+
+    Identical resubmissions (retries, reloads) are served from an in-process
+    cache keyed by the SHA-256 of the decoded audio.
+    """
+    # Lazy: tools.speech loads the Whisper model at import time
     from tools.speech import transcribe_audio
 
-    audio_bytes = base64.b64decode(audio_b64)
-    with tempfile.NamedTemporaryFile(suffix=".webm", delete=False) as f:
-        f.write(audio_bytes)
-        tmp_path = f.name
+    audio_bytes, digest = await asyncio.to_thread(_decode_audio, audio_b64)
+    cache_key = f"{lang}:{digest}"
+    cached = _transcript_cache.get(cache_key)
+    if cached is not None:
+        _transcript_cache.move_to_end(cache_key)
+        logger.info("Transcript cache hit for audio hash %s", digest[:16])
+        return cached
 
+    tmp_path = await asyncio.to_thread(_write_audio_tempfile, audio_bytes)
     try:
-        text = transcribe_audio(tmp_path, lang=lang)
-        return text.strip()
+        text = await asyncio.to_thread(transcribe_audio, tmp_path, lang=lang)
+        text = text.strip()
     finally:
         try:
-            os.remove(tmp_path)
+            await asyncio.to_thread(os.remove, tmp_path)
         except Exception:
             pass
 
+    _transcript_cache[cache_key] = text
+    if len(_transcript_cache) > _TRANSCRIPT_CACHE_MAX:
+        _transcript_cache.popitem(last=False)
+    return text
+
+
+def _decode_audio(audio_b64: str) -> tuple[bytes, str]:
+    audio_bytes = base64.b64decode(audio_b64)
+    return audio_bytes, hashlib.sha256(audio_bytes).hexdigest()
+
+
+def _write_audio_tempfile(audio_bytes: bytes) -> str:
+    with tempfile.NamedTemporaryFile(suffix=".webm", delete=False) as f:
+        f.write(audio_bytes)
+        return f.name
+
 
 async def _enrich_actions(
     actions: list[dict],
@@ -473,7 +649,6 @@ async def _enrich_actions(
     Post-process actions: fill in missing payload fields from extracted data,
     resolve relative dates/times, and drop actions that have no viable data.
     """
-    from utils.timezone import now as now_toronto
 
     current_dt = now_toronto()
 
@@ -504,14 +679,15 @@ async def _enrich_actions(
         slack_msg = "Autopilot summary unavailable." if lang == "en" else "Autopilot 摘要暂无。"
 
     action_list = list(actions or [])
-    if not any(a.get("action_type") == "send_slack_summary" for a in action_list):
+    present_types = {a.get("action_type") for a in action_list}
+    if "send_slack_summary" not in present_types:
         action_list.append({
             "action_type": "send_slack_summary",
             "requires_confirmation": True,
             "confidence": 0.9,
             "payload": {},
         })
-    if email and not any(a.get("action_type") == "send_email_followup" for a in action_list):
+    if email and "send_email_followup" not in present_types:
         action_list.append({
             "action_type": "send_email_followup",
             "requires_confirmation": True,
@@ -519,71 +695,133 @@ async def _enrich_actions(
             "payload": {},
         })
 
+    default_subject = (
+        f"{'Re: ' if lang == 'en' else '回复: '}{summary[:60]}" if summary
+        else ("Follow-up" if lang == "en" else "跟进")
+    )
+    ctx = _EnrichContext(
+        summary=summary,
+        urgency=urgency,
+        email=email,
+        slack_msg=slack_msg,
+        default_subject=default_subject,
+        lang=lang,
+        extracted=extracted,
+        draft=draft or {},
+        email_content=email_content,
+        current_dt=current_dt,
+    )
+
     enriched = []
     for action in action_list:
-        a = {**action}
-        payload = {**(a.get("payload") or {})}
-        atype = a.get("action_type", "none")
-
-        if atype == "create_meeting":
-            # Enrich title with key information (budget, product, company) from extracted data
-            payload = _enrich_calendar_title(payload, summary, extracted, lang)
-            payload = _prepare_calendar_payload_for_preview(payload, summary, lang, current_dt)
-
-        elif atype == "send_slack_summary":
-            if not payload.get("message"):
-                payload["message"] = slack_msg
-            if not payload.get("channel"):
-                payload["channel"] = "#general"
-
-        elif atype == "send_email_followup":
-            # Only keep if we have a recipient email
-            if not payload.get("to"):
-                if email:
-                    payload["to"] = email
-                else:
-                    # Skip — no email address available
-                    continue
-            if not payload.get("subject"):
-                subject = email_content.get("subject", "")
-                if not subject:
-                    subject_prefix = "Re: " if lang == "en" else "回复: "
-                    subject = f"{subject_prefix}{summary[:60]}" if summary else ("Follow-up" if lang == "en" else "跟进")
-                payload["subject"] = subject
-            body_text = email_content.get("body_text") or payload.get("body_text") or payload.get("body") or ""
-            if not body_text:
-                reply_text = draft.get("reply_text", "") if draft else ""
-                body_text = reply_text if reply_text else summary
-            payload["body_text"] = body_text
-            payload["body"] = body_text
-            body_html = email_content.get("body_html") or payload.get("body_html") or ""
-            if body_html:
-                payload["body_html"] = body_html
-            from_name = email_content.get("from_name")
-            if from_name:
-                payload["from_name"] = from_name
-
-        elif atype == "create_ticket":
-            if not payload.get("title"):
-                payload["title"] = summary[:120] if summary else "New ticket"
-            if not payload.get("description"):
-                payload["description"] = summary
-            if not payload.get("priority"):
-                priority_map = {"high": "high", "medium": "medium", "low": "low"}
-                payload["priority"] = priority_map.get(urgency, "medium")
-
-        a["payload"] = payload
-        enriched.append(a)
+        original = action.get("payload")
+        handler = _ENRICH_HANDLERS.get(action.get("action_type", "none"), _enrich_noop)
+        # Handlers copy the payload only when they write to it
+        payload = handler(original if original is not None else {}, ctx)
+        if payload is None:
+            continue
+        enriched.append(action if payload is original else {**action, "payload": payload})
 
     return enriched
 
 
+class _EnrichContext(NamedTuple):
+    """Per-run values shared by every action handler in _enrich_actions."""
+    summary: str
+    urgency: str
+    email: str | None
+    slack_msg: str
+    default_subject: str
+    lang: str
+    extracted: dict
+    draft: dict
+    email_content: dict
+    current_dt: datetime
+
+
+def _with_updates(payload: dict, updates: dict) -> dict:
+    """Return payload unchanged when there is nothing to add, else a merged copy."""
+    return {**payload, **updates} if updates else payload
+
+
+def _enrich_meeting(payload: dict, ctx: _EnrichContext) -> dict:
+    # The title/preview helpers write in place and always fill at least one field
+    payload = dict(payload)
+    # Enrich title with key information (budget, product, company) from extracted data
+    payload = _enrich_calendar_title(payload, ctx.summary, ctx.extracted, ctx.lang)
+    return _prepare_calendar_payload_for_preview(payload, ctx.summary, ctx.lang, ctx.current_dt)
+
+
+def _enrich_slack(payload: dict, ctx: _EnrichContext) -> dict:
+    updates = {}
+    if not payload.get("message"):
+        updates["message"] = ctx.slack_msg
+    if not payload.get("channel"):
+        updates["channel"] = "#general"
+    return _with_updates(payload, updates)
+
+
+def _enrich_email(payload: dict, ctx: _EnrichContext) -> dict | None:
+    email_content = ctx.email_content
+    # Only keep if we have a recipient email
+    if not payload.get("to") and not ctx.email:
+        # Skip — no email address available
+        return None
+    # body_text/body are always written below
+    payload = dict(payload)
+    if not payload.get("to"):
+        payload["to"] = ctx.email
+    if not payload.get("subject"):
+        payload["subject"] = email_content.get("subject", "") or ctx.default_subject
+    body_text = email_content.get("body_text") or payload.get("body_text") or payload.get("body") or ""
+    if not body_text:
+        body_text = ctx.draft.get("reply_text", "") or ctx.summary
+    payload["body_text"] = body_text
+    payload["body"] = body_text
+    body_html = email_content.get("body_html") or payload.get("body_html") or ""
+    if body_html:
+        payload["body_html"] = body_html
+    from_name = email_content.get("from_name")
+    if from_name:
+        payload["from_name"] = from_name
+    return payload
+
+
+_TICKET_PRIORITIES = {"high": "high", "medium": "medium", "low": "low"}
+
+
+def _enrich_ticket(payload: dict, ctx: _EnrichContext) -> dict:
+    summary = ctx.summary
+    updates = {}
+    if not payload.get("title"):
+        updates["title"] = summary[:120] if summary else "New ticket"
+    if not payload.get("description"):
+        updates["description"] = summary
+    if not payload.get("priority"):
+        updates["priority"] = _TICKET_PRIORITIES.get(ctx.urgency, "medium")
+    return _with_updates(payload, updates)
+
+
+def _enrich_noop(payload: dict, ctx: _EnrichContext) -> dict:
+    return payload
+
+
+# Handlers return the filled payload (the same object if untouched), or None to drop the action
+_ENRICH_HANDLERS = {
+    "create_meeting": _enrich_meeting,
+    "send_slack_summary": _enrich_slack,
+    "send_email_followup": _enrich_email,
+    "create_ticket": _enrich_ticket,
+}
+
+
 def _resolve_date(value: str, ref_dt, lang: str = "en") -> str:
     """Ensure a date value is in YYYY-MM-DD format. GPT resolves via prompt-injected datetime."""
-    from datetime import datetime
     if not value:
         return ref_dt.strftime("%Y-%m-%d")
-    # Already ISO
+    # Already ISO; strptime below still accepts unpadded forms
+    if is_iso_date(value):
+        return value
     try:
         datetime.strptime(value, "%Y-%m-%d")
         return value
@@ -591,11 +829,8 @@ def _resolve_date(value: str, ref_dt, lang: str = "en") -> str:
         pass
     # Lightweight dateparser fallback (no keyword NLP)
     try:
-        import dateparser
-        dt = dateparser.parse(value, settings={
-            "PREFER_DATES_FROM": "future",
-            "RELATIVE_BASE": ref_dt.replace(tzinfo=None),
-        })
+        base = ref_dt.replace(tzinfo=None, second=0, microsecond=0)
+        dt = _date_parser(base, lang.startswith("zh")).get_date_data(value).date_obj
         if dt:
             return dt.strftime("%Y-%m-%d")
     except Exception:
@@ -603,28 +838,16 @@ def _resolve_date(value: str, ref_dt, lang: str = "en") -> str:
     return value
 
 
-def _resolve_time(value: str) -> str:
-    """Ensure a time value is in HH:MM 24-hour format."""
-    from datetime import datetime
-    if not value:
-        return ""
-    try:
-        datetime.strptime(value, "%H:%M")
-        return value
-    except ValueError:
-        pass
-    try:
-        t = datetime.strptime(value, "%H:%M:%S")
-        return t.strftime("%H:%M")
-    except ValueError:
-        pass
-    for fmt in ("%I:%M %p", "%I:%M%p", "%I %p", "%I%p"):
-        try:
-            t = datetime.strptime(value.strip(), fmt)
-            return t.strftime("%H:%M")
-        except ValueError:
-            continue
-    return value
+@lru_cache(maxsize=8)
+def _date_parser(relative_base: datetime, prefer_zh: bool) -> DateDataParser:
+    """
+    dateparser.parse builds a new parser (settings + language loaders) on every call
+    when settings are passed; reuse one per reference minute instead.
+    """
+    return DateDataParser(
+        languages=["zh", "en"] if prefer_zh else ["en", "zh"],
+        settings={"PREFER_DATES_FROM": "future", "RELATIVE_BASE": relative_base},
+    )
 
 
 def _enrich_calendar_title(payload: dict, summary: str, extracted: dict, lang: str) -> dict:
@@ -696,7 +919,6 @@ def _enrich_calendar_title(payload: dict, summary: str, extracted: dict, lang: s
 
 def _prepare_calendar_payload_for_preview(payload: dict, summary: str, lang: str, current_dt) -> dict:
     """Ensure calendar payload has editable fields without forcing defaults or LLM calls."""
-    from datetime import datetime, timedelta
     if not payload.get("title"):
         payload["title"] = summary[:80] if summary else ("Meeting" if lang == "en" else "æ—¥ç¨‹å®‰æŽ’")
     if "date" not in payload:
@@ -726,7 +948,6 @@ def _prepare_calendar_payload_for_preview(payload: dict, summary: str, lang: str
 
 def _finalize_calendar_payload(payload: dict, summary: str, lang: str, current_dt) -> dict:
     """Fill missing fields with defaults right before execution."""
-    from datetime import datetime, timedelta
     if not payload.get("title"):
         payload["title"] = summary[:80] if summary else ("Meeting" if lang == "en" else "æ—¥ç¨‹å®‰æŽ’")
     if payload.get("date"):
@@ -808,11 +1029,10 @@ def _append_confirmation_to_email_payload(payload: dict, confirmation_text: str,
 
 def _merge_extracted_actions(extracted: dict, enriched_actions: list[dict]) -> dict:
     """Merge enriched action payloads back into extracted output for display."""
-    try:
-        merged = json.loads(json.dumps(extracted))
-    except Exception:
-        merged = dict(extracted or {})
-    extracted_actions = list(merged.get("next_best_actions", []) or [])
+    # Only the action dicts get their "payload" replaced below, so a one-level
+    # copy of each action is enough to leave the stored extraction untouched.
+    merged = dict(extracted or {})
+    extracted_actions = [dict(a) for a in (merged.get("next_best_actions") or [])]
     pool = list(enriched_actions or [])
     for ex in extracted_actions:
         atype = ex.get("action_type")
@@ -874,23 +1094,53 @@ def _normalize_lang(lang: str | None) -> str:
     return "en" if lang.lower().startswith("en") else "zh"
 
 
+_ZH_GREETINGS = ("你好", "您好", "嗨", "哈喽")
+_EN_GREETINGS = ("hi", "hello", "dear")
+_EN_GREETING_MAX_LEN = max(len(g) for g in _EN_GREETINGS)
+
+
 def _starts_with_greeting(text: str, lang: str) -> bool:
-    s = (text or "").strip().lower()
+    if not text:
+        return False
+    s = text.lstrip()
     if not s:
         return False
     if lang == "zh":
-        return s.startswith(("你好", "您好", "嗨", "哈喽"))
-    return s.startswith(("hi", "hello", "dear"))
+        # Chinese has no case, match the original text directly
+        return s.startswith(_ZH_GREETINGS)
+    # Only the head can match, so lowercase just that instead of the whole draft
+    return s[:_EN_GREETING_MAX_LEN].lower().startswith(_EN_GREETINGS)
 
 
 def _text_to_html(text: str) -> str:
     if not text:
         return ""
-    paragraphs = []
-    for block in text.strip().split("\n\n"):
-        lines = [html.escape(line) for line in block.split("\n")]
-        paragraphs.append("<p>" + "<br/>".join(lines) + "</p>")
-    return "\n".join(paragraphs)
+    # Escape once up front; the only markup injected afterwards is our own tags
+    escaped = html.escape(text.strip())
+    return "\n".join(
+        "<p>" + block.replace("\n", "<br/>") + "</p>"
+        for block in escaped.split("\n\n")
+    )
+
+
+# Fixed email fragments per language; templates contain no HTML-special characters,
+# so only the dynamic contact name needs escaping at render time.
+_EMAIL_GREETINGS = {
+    ("en", True): "Hi {},",
+    ("en", False): "Hello,",
+    ("zh", True): "您好{}：",
+    ("zh", False): "您好：",
+}
+_EMAIL_SIGNATURE = {
+    "en": "Voice Autopilot (noreply)",
+    "zh": "Voice Autopilot（noreply）",
+}
+_EMAIL_FOOTER = {
+    "en": "This is an automated message from noreply. Please do not reply.",
+    "zh": "此邮件由 noreply 自动发送，请勿直接回复。",
+}
+_EMAIL_SIGNATURE_HTML = {lang: f"<p><strong>{html.escape(text)}</strong></p>" for lang, text in _EMAIL_SIGNATURE.items()}
+_EMAIL_FOOTER_HTML = {lang: f"<p class=\"email-footer\">{html.escape(text)}</p>" for lang, text in _EMAIL_FOOTER.items()}
 
 
 def _build_email_content(draft: dict, extracted: dict) -> dict:
@@ -905,36 +1155,29 @@ def _build_email_content(draft: dict, extracted: dict) -> dict:
     subject = f"{subject_prefix}{summary[:60]}" if summary else ("Follow-up" if lang == "en" else "跟进")
 
     greeting = ""
+    greeting_html = ""
     if not _starts_with_greeting(reply_text, lang):
-        if lang == "zh":
-            greeting = f"您好{contact}：" if contact else "您好："
-        else:
-            greeting = f"Hi {contact}," if contact else "Hello,"
-
-    signature = "Voice Autopilot (noreply)" if lang == "en" else "Voice Autopilot（noreply）"
-    footer = (
-        "This is an automated message from noreply. Please do not reply."
-        if lang == "en"
-        else "此邮件由 noreply 自动发送，请勿直接回复。"
-    )
+        template = _EMAIL_GREETINGS[(lang, bool(contact))]
+        greeting = template.format(contact)
+        greeting_html = f"<p>{template.format(html.escape(contact))}</p>"
 
     body_parts = []
     if greeting:
         body_parts.append(greeting)
     if reply_text:
         body_parts.append(reply_text)
-    body_parts.append(signature)
-    body_parts.append(footer)
+    body_parts.append(_EMAIL_SIGNATURE[lang])
+    body_parts.append(_EMAIL_FOOTER[lang])
     body_text = "\n\n".join(body_parts).strip()
 
     body_html = "\n".join(
         filter(
             None,
             [
-                f"<p>{html.escape(greeting)}</p>" if greeting else "",
+                greeting_html,
                 _text_to_html(reply_text),
-                f"<p><strong>{html.escape(signature)}</strong></p>",
-                f"<p class=\"email-footer\">{html.escape(footer)}</p>",
+                _EMAIL_SIGNATURE_HTML[lang],
+                _EMAIL_FOOTER_HTML[lang],
             ],
         )
     )
@@ -0,0 +1,23 @@
+"""JSON helpers for prompts and tool-call arguments; orjson when installed, stdlib json otherwise."""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used otherwise
+    orjson = None
+
+
+def dumps(value, *, indent: bool = False, default=None) -> str:
+    """Serialize with non-ASCII kept, optionally with 2-space indentation and a fallback encoder."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(value, default=default, option=option).decode("utf-8")
+    return json.dumps(value, ensure_ascii=False, indent=2 if indent else None, default=default)
+
+
+def loads(raw: str | bytes):
+    """Parse JSON; both backends raise a json.JSONDecodeError subclass on bad input."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
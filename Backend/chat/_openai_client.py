@@ -0,0 +1,57 @@
+"""Process-wide AsyncOpenAI client shared by the extractors, reply drafter and RAG."""
+
+import logging
+import os
+from collections import defaultdict
+
+import httpx
+from openai import AsyncOpenAI, BadRequestError, DefaultAsyncHttpxClient
+
+from chat._ratelimit import throttle
+
+logger = logging.getLogger(__name__)
+
+# Keep idle connections around between voice requests so they skip the TLS handshake
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "32"))
+
+# Sampling/format kwargs some models reject; dropped and retried on BadRequestError
+_OPTIONAL_PARAMS = ("temperature", "response_format")
+
+_client: AsyncOpenAI | None = None
+# model -> optional kwargs it has rejected before, so later calls skip the failing round-trip
+_unsupported_params: defaultdict[str, set[str]] = defaultdict(set)
+
+
+def get_client() -> AsyncOpenAI:
+    """Return the shared client, so every pipeline uses one connection pool."""
+    global _client
+    if _client is None:
+        limits = httpx.Limits(
+            max_connections=100,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+        )
+        _client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=DefaultAsyncHttpxClient(limits=limits),
+        )
+    return _client
+
+
+async def create_chat_completion(client: AsyncOpenAI, **kwargs):
+    """chat.completions.create, paced by chat._ratelimit and remembering per model which optional kwargs it rejects."""
+    model = kwargs["model"]
+    for param in _unsupported_params[model]:
+        kwargs.pop(param, None)
+    while True:
+        await throttle(kwargs.get("messages") or [])
+        try:
+            return await client.chat.completions.create(**kwargs)
+        except BadRequestError as e:
+            param = next((p for p in _OPTIONAL_PARAMS if p in kwargs and p in str(e)), None)
+            if param is None:
+                raise
+            logger.info("Model %s does not support %s, retrying without it", model, param)
+            _unsupported_params[model].add(param)
+            kwargs.pop(param)
@@ -0,0 +1,63 @@
+"""Client-side pacing for OpenAI calls, so bursts wait locally instead of hitting 429s."""
+
+import asyncio
+import os
+import time
+
+try:
+    from aiolimiter import AsyncLimiter
+except ImportError:  # optional: fall back to a minimal leaky bucket with the same interface
+    AsyncLimiter = None
+
+# Opt-in: unset or 0 leaves the corresponding limit off (set them to your account tier's limits)
+OPENAI_RPM = int(os.getenv("OPENAI_RPM") or "0")
+OPENAI_TPM = int(os.getenv("OPENAI_TPM") or "0")
+
+
+class _LeakyBucket:
+    """Subset of aiolimiter.AsyncLimiter: acquire(amount) waits until capacity is available."""
+
+    def __init__(self, max_rate: float, time_period: float = 60):
+        self.max_rate = max_rate
+        self._drain_per_sec = max_rate / time_period
+        self._level = 0.0
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._level = max(0.0, self._level - (now - self._last) * self._drain_per_sec)
+                self._last = now
+                if self._level + amount <= self.max_rate:
+                    self._level += amount
+                    return
+                await asyncio.sleep((self._level + amount - self.max_rate) / self._drain_per_sec)
+
+
+def _make_limiter(max_rate: int):
+    if max_rate <= 0:
+        return None
+    if AsyncLimiter is not None:
+        return AsyncLimiter(max_rate, 60)
+    return _LeakyBucket(max_rate, 60)
+
+
+REQUEST_LIMITER = _make_limiter(OPENAI_RPM)
+TOKEN_LIMITER = _make_limiter(OPENAI_TPM)
+
+
+def estimate_tokens(messages: list[dict]) -> int:
+    """Rough prompt size (~4 chars per token); good enough for pacing without a tokenizer."""
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 4 + 1
+
+
+async def throttle(messages: list[dict]) -> None:
+    """Wait until one more request of this size fits within the RPM/TPM budgets."""
+    if REQUEST_LIMITER is not None:
+        await REQUEST_LIMITER.acquire()
+    if TOKEN_LIMITER is not None:
+        # A single oversized request may use the whole budget but never more (acquire would refuse)
+        await TOKEN_LIMITER.acquire(min(estimate_tokens(messages), TOKEN_LIMITER.max_rate))
@@ -1,50 +1,76 @@
 """OpenAI Tool Calling extractor for autopilot structured output."""
 
+import asyncio
 import json
 import logging
 import os
 from functools import lru_cache
 from pathlib import Path
+from typing import Callable
 
-import jsonschema
-from openai import AsyncOpenAI, BadRequestError
+from openai import AsyncOpenAI
 
+from chat import _json
+from chat._openai_client import create_chat_completion, get_client as get_openai_client
 from utils.timezone import now as now_toronto, TIMEZONE
 
+try:
+    import fastjsonschema
+except ImportError:  # optional: compiled validators, falls back to jsonschema
+    fastjsonschema = None
+
 logger = logging.getLogger(__name__)
 
 BUSINESS_DIR = Path(__file__).resolve().parent.parent / "business"
 PROMPT_DIR = Path(__file__).resolve().parent / "prompt"
 
-_client: AsyncOpenAI | None = None
-
+AUTOPILOT_EXTRACT_MODEL = os.getenv("OPENAI_AUTOPILOT_EXTRACT_MODEL") or os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
 
-def get_openai_client() -> AsyncOpenAI:
-    global _client
-    if _client is None:
-        _client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    return _client
+# id(schema) -> (schema, validator); the schema is kept to guard against id reuse
+_VALIDATOR_CACHE: dict[int, tuple[dict, object]] = {}
+_FASTJSON_VALIDATORS: dict[int, tuple[dict, Callable | None]] = {}
+# jsonschema costs ~60ms to import and is not needed when fastjsonschema validates successfully
+_jsonschema_module = None
 
 
 @lru_cache(maxsize=4)
 def _load_schema(schema_name: str = "autopilot_schema.json") -> dict:
-    path = BUSINESS_DIR / schema_name
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return _json.loads((BUSINESS_DIR / schema_name).read_bytes())
+
+
+@lru_cache(maxsize=4)
+def _load_schema_serialized(schema_name: str = "autopilot_schema.json") -> str:
+    """Pretty-printed schema for the repair prompt."""
+    return _json.dumps(_load_schema(schema_name), indent=True)
 
 
 @lru_cache(maxsize=4)
 def _load_prompt(prompt_name: str = "autopilot_extraction.txt") -> str:
-    path = PROMPT_DIR / prompt_name
-    with open(path, "r", encoding="utf-8") as f:
-        return f.read().strip()
+    return (PROMPT_DIR / prompt_name).read_text(encoding="utf-8").strip()
+
+
+# Load the defaults at import so the first extraction doesn't pay disk I/O and parsing
+_load_schema()
+_load_prompt()
 
 
-def _build_tools(schema: dict) -> list[dict]:
-    """Build OpenAI tools definition from the JSON schema."""
+def _datetime_message(current_dt) -> dict:
+    """
+    Current datetime as a leading user message. Keeping it out of the system prompt
+    leaves that prefix byte-identical across requests for OpenAI prompt caching.
+    """
+    return {
+        "role": "user",
+        "content": f"CURRENT_DATETIME={current_dt.strftime('%Y-%m-%d %H:%M (%A)')}\nTIMEZONE={TIMEZONE}",
+    }
+
+
+@lru_cache(maxsize=4)
+def _get_tools(schema_name: str = "autopilot_schema.json") -> tuple[dict, ...]:
+    """Build OpenAI tools definition from the JSON schema (a tuple, so the cached value can't be mutated)."""
     # Remove $schema key which is not valid in function parameters
-    params = {k: v for k, v in schema.items() if k != "$schema"}
-    return [
+    params = {k: v for k, v in _load_schema(schema_name).items() if k != "$schema"}
+    return (
         {
             "type": "function",
             "function": {
@@ -52,9 +78,105 @@ def _build_tools(schema: dict) -> list[dict]:
                 "description": "Extract structured fields from a sales/support conversation.",
                 "parameters": params,
             },
-        }
+        },
+    )
+
+
+@lru_cache(maxsize=4)
+def _get_batch_tools(schema_name: str = "autopilot_schema.json") -> tuple[dict, ...]:
+    """Tool whose arguments hold one extraction per transcript, in input order."""
+    schema = _load_schema(schema_name)
+    item = {k: v for k, v in schema.items() if k not in ("$schema", "definitions")}
+    params = {
+        "type": "object",
+        "properties": {"results": {"type": "array", "items": item}},
+        "required": ["results"],
+    }
+    if "definitions" in schema:
+        # Keep "#/definitions/..." refs resolvable from the new root
+        params["definitions"] = schema["definitions"]
+    return (
+        {
+            "type": "function",
+            "function": {
+                "name": "parse_autopilot_conversations",
+                "description": "Extract structured fields from each of several sales/support conversations.",
+                "parameters": params,
+            },
+        },
+    )
+
+
+_BATCH_INSTRUCTIONS = (
+    "\n\nBATCH MODE: the last user message is a JSON array of independent conversation transcripts. "
+    "Apply the rules above to each transcript separately and call `parse_autopilot_conversations` once, "
+    "with `results` containing exactly one extraction per transcript, in the same order."
+)
+
+
+async def extract_autopilot_json_batch(
+    transcripts: list[str],
+    *,
+    model: str | None = None,
+    schema_name: str = "autopilot_schema.json",
+    prompt_name: str = "autopilot_extraction.txt",
+    run_id: str = "",
+) -> list[dict]:
+    """
+    Extract several transcripts with one tool call, for bulk/offline use.
+    Returns one validated dict per transcript, in order. Items missing from the batch
+    response or failing validation are re-extracted individually (with repair pass).
+    """
+    if not transcripts:
+        return []
+    if len(transcripts) == 1:
+        return [await extract_autopilot_json(transcripts[0], model=model, schema_name=schema_name,
+                                             prompt_name=prompt_name, run_id=run_id)]
+
+    client = get_openai_client()
+    model = model or AUTOPILOT_EXTRACT_MODEL
+    schema = _load_schema(schema_name)
+
+    messages = [
+        {"role": "system", "content": _load_prompt(prompt_name) + _BATCH_INSTRUCTIONS},
+        _datetime_message(now_toronto()),
+        {"role": "user", "content": _json.dumps(transcripts)},
     ]
 
+    logger.info("[%s] Batch extraction request: model=%s, transcripts=%d", run_id, model, len(transcripts))
+
+    response = await _call_with_tools(client, model, messages, list(_get_batch_tools(schema_name)))
+    raw_args = response.choices[0].message.tool_calls[0].function.arguments
+    try:
+        items = _json.loads(raw_args).get("results") or []
+    except (json.JSONDecodeError, AttributeError) as e:
+        logger.warning("[%s] Batch output unparseable, extracting individually: %s", run_id, e)
+        items = []
+
+    results: list[dict | None] = []
+    for idx in range(len(transcripts)):
+        item = items[idx] if idx < len(items) and isinstance(items[idx], dict) else None
+        if item is not None:
+            try:
+                _auto_fix_actions(item)
+                _validate(item, schema)
+            except _jsonschema().ValidationError as e:
+                logger.warning("[%s] Batch item %d failed validation: %s", run_id, idx, e)
+                item = None
+        results.append(item)
+
+    retry = [idx for idx, item in enumerate(results) if item is None]
+    if retry:
+        logger.info("[%s] Re-extracting %d batch item(s) individually", run_id, len(retry))
+        fixed = await asyncio.gather(*(
+            extract_autopilot_json(transcripts[idx], model=model, schema_name=schema_name,
+                                   prompt_name=prompt_name, run_id=run_id)
+            for idx in retry
+        ))
+        for idx, item in zip(retry, fixed):
+            results[idx] = item
+    return results
+
 
 async def extract_autopilot_json(
     transcript: str,
@@ -69,20 +191,14 @@ async def extract_autopilot_json(
     Returns validated JSON dict. Raises on persistent validation failure.
     """
     client = get_openai_client()
-    model = model or os.getenv("OPENAI_AUTOPILOT_EXTRACT_MODEL") or os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
+    model = model or AUTOPILOT_EXTRACT_MODEL
     schema = _load_schema(schema_name)
-    prompt_template = _load_prompt(prompt_name)
-    tools = _build_tools(schema)
-
-    # Inject current datetime so GPT can resolve relative dates
-    current_dt = now_toronto()
-    system_prompt = prompt_template.format(
-        current_datetime=current_dt.strftime("%Y-%m-%d %H:%M (%A)"),
-        timezone_name=str(TIMEZONE),
-    )
+    tools = list(_get_tools(schema_name))
 
     messages = [
-        {"role": "system", "content": system_prompt},
+        {"role": "system", "content": _load_prompt(prompt_name)},
+        # Inject current datetime so GPT can resolve relative dates
+        _datetime_message(now_toronto()),
         {"role": "user", "content": transcript},
     ]
 
@@ -97,12 +213,12 @@ async def extract_autopilot_json(
     # First attempt: parse and validate
     validation_error_msg = ""
     try:
-        parsed = json.loads(raw_args)
+        parsed = _json.loads(raw_args)
         _auto_fix_actions(parsed)
         _validate(parsed, schema)
         logger.info("[%s] Extraction validated on first pass", run_id)
         return parsed
-    except (json.JSONDecodeError, jsonschema.ValidationError) as first_err:
+    except (json.JSONDecodeError, _jsonschema().ValidationError) as first_err:
         validation_error_msg = str(first_err)
         logger.warning("[%s] First pass validation failed: %s", run_id, validation_error_msg)
 
@@ -120,7 +236,7 @@ async def extract_autopilot_json(
             "content": (
                 f"Invalid output:\n```\n{raw_args}\n```\n\n"
                 f"Validation error: {validation_error_msg}\n\n"
-                f"Schema:\n```json\n{json.dumps(schema, indent=2)}\n```"
+                f"Schema:\n```json\n{_load_schema_serialized(schema_name)}\n```"
             ),
         },
     ]
@@ -133,52 +249,89 @@ async def extract_autopilot_json(
     repair_args = repair_call.function.arguments
 
     try:
-        parsed = json.loads(repair_args)
+        parsed = _json.loads(repair_args)
         _auto_fix_actions(parsed)
         _validate(parsed, schema)
         logger.info("[%s] Extraction validated on repair pass", run_id)
         return parsed
-    except (json.JSONDecodeError, jsonschema.ValidationError) as repair_err:
+    except (json.JSONDecodeError, _jsonschema().ValidationError) as repair_err:
         logger.error("[%s] Repair pass also failed: %s", run_id, repair_err)
         raise ValueError(f"Extraction failed after repair pass: {repair_err}") from repair_err
 
 
 def _auto_fix_actions(data: dict) -> None:
     """Patch common model omissions before schema validation."""
-    for action in data.get("next_best_actions", []):
-        if "payload" not in action:
-            action["payload"] = {}
-        if "requires_confirmation" not in action:
-            action["requires_confirmation"] = True
+    for action in data.get("next_best_actions") or ():
+        action.setdefault("payload", {})
+        action.setdefault("requires_confirmation", True)
 
 
 async def _call_with_tools(client: AsyncOpenAI, model: str, messages: list, tools: list):
-    """Call chat completions with tool_choice; fall back to no temperature if model rejects it."""
-    kwargs = dict(
+    """Call chat completions with tool_choice; temperature is dropped for models that reject it."""
+    return await create_chat_completion(
+        client,
         model=model,
         messages=messages,
         tools=tools,
-        tool_choice={"type": "function", "function": {"name": "parse_autopilot_conversation"}},
+        tool_choice={"type": "function", "function": {"name": tools[0]["function"]["name"]}},
         temperature=0,
     )
-    try:
-        return await client.chat.completions.create(**kwargs)
-    except BadRequestError as e:
-        if "temperature" in str(e):
-            logger.info("Model %s does not support temperature=0, retrying without it", model)
-            kwargs.pop("temperature")
-            return await client.chat.completions.create(**kwargs)
-        raise
 
 
 def _validate(data: dict, schema: dict) -> None:
-    """Validate data against JSON schema, resolving local $ref definitions."""
+    """
+    Validate data against JSON schema, resolving local $ref definitions.
+    Raises jsonschema.ValidationError whichever validator backend is used.
+    """
+    fast = _get_fast_validator(schema)
+    if fast is not None:
+        try:
+            fast(data)
+            return
+        except fastjsonschema.JsonSchemaValueException as e:
+            raise _jsonschema().ValidationError(e.message) from e
+    _get_validator(schema).validate(data)
+
+
+def _get_fast_validator(schema: dict) -> Callable | None:
+    """Compiled fastjsonschema validator, or None when unavailable or the schema won't compile."""
+    if fastjsonschema is None:
+        return None
+    cached = _FASTJSON_VALIDATORS.get(id(schema))
+    if cached is not None and cached[0] is schema:
+        return cached[1]
+    try:
+        # use_default=False: validation must not write schema defaults into the model output
+        compiled = fastjsonschema.compile(schema, use_default=False)
+    except fastjsonschema.JsonSchemaDefinitionException as e:
+        logger.warning("fastjsonschema cannot compile schema, using jsonschema: %s", e)
+        compiled = None
+    _FASTJSON_VALIDATORS[id(schema)] = (schema, compiled)
+    return compiled
+
+
+def _get_validator(schema: dict):
+    """Build the validator once per schema; _load_schema keeps schema dicts alive and identical."""
+    cached = _VALIDATOR_CACHE.get(id(schema))
+    if cached is not None and cached[0] is schema:
+        return cached[1]
+    jsonschema = _jsonschema()
     try:
         from referencing import Registry, Resource
-        resource = Resource.from_contents(schema)
-        registry = Registry().with_resource("", resource)
-        validator = jsonschema.Draft7Validator(schema, registry=registry)
-        validator.validate(data)
     except ImportError:
         # Fallback for older jsonschema without referencing
-        jsonschema.validate(instance=data, schema=schema)
+        validator = jsonschema.validators.validator_for(schema)(schema)
+    else:
+        registry = Registry().with_resource("", Resource.from_contents(schema))
+        validator = jsonschema.Draft7Validator(schema, registry=registry)
+    _VALIDATOR_CACHE[id(schema)] = (schema, validator)
+    return validator
+
+
+def _jsonschema():
+    """Import jsonschema on first use."""
+    global _jsonschema_module
+    if _jsonschema_module is None:
+        import jsonschema
+        _jsonschema_module = jsonschema
+    return _jsonschema_module
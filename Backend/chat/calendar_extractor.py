@@ -1,14 +1,16 @@
 """GPT-based calendar slot extractor using OpenAI Tool Calling."""
 
-import json
 import logging
 import os
 from datetime import datetime, date, time
 from functools import lru_cache
 from pathlib import Path
 
-from openai import AsyncOpenAI, BadRequestError
+from openai import AsyncOpenAI
 
+from chat import _json
+from chat._openai_client import create_chat_completion, get_client as get_openai_client
+from utils.datetime_fmt import is_iso_date, normalise_time as _normalise_time
 from utils.timezone import now as now_toronto, TIMEZONE
 
 logger = logging.getLogger(__name__)
@@ -16,31 +18,36 @@ logger = logging.getLogger(__name__)
 BUSINESS_DIR = Path(__file__).resolve().parent.parent / "business"
 PROMPT_DIR = Path(__file__).resolve().parent / "prompt"
 
-_client: AsyncOpenAI | None = None
-
-
-def get_openai_client() -> AsyncOpenAI:
-    global _client
-    if _client is None:
-        _client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    return _client
+CALENDAR_MODEL = os.getenv("OPENAI_CALENDAR_MODEL") or os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
 
 
 @lru_cache(maxsize=4)
 def _load_schema(name: str = "calendar_schema.json") -> dict:
-    with open(BUSINESS_DIR / name, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return _json.loads((BUSINESS_DIR / name).read_bytes())
 
 
 @lru_cache(maxsize=4)
 def _load_prompt_template(name: str = "calendar_extraction.txt") -> str:
-    with open(PROMPT_DIR / name, "r", encoding="utf-8") as f:
-        return f.read().strip()
+    return (PROMPT_DIR / name).read_text(encoding="utf-8").strip()
+
+
+# Load the defaults at import so the first extraction doesn't pay disk I/O and parsing
+_load_schema()
+_load_prompt_template()
+
+
+def _datetime_message(current_dt: datetime) -> dict:
+    # Kept out of the system prompt so that prefix stays cacheable
+    return {
+        "role": "user",
+        "content": f"CURRENT_DATETIME={current_dt.strftime('%Y-%m-%d %H:%M (%A)')}\nTIMEZONE={TIMEZONE}",
+    }
 
 
-def _build_tools(schema: dict) -> list[dict]:
-    params = {k: v for k, v in schema.items() if k != "$schema"}
-    return [
+@lru_cache(maxsize=4)
+def _get_tools(schema_name: str = "calendar_schema.json") -> tuple[dict, ...]:
+    params = {k: v for k, v in _load_schema(schema_name).items() if k != "$schema"}
+    return (
         {
             "type": "function",
             "function": {
@@ -48,26 +55,19 @@ def _build_tools(schema: dict) -> list[dict]:
                 "description": "Extract calendar event fields (date, start/end time, title, attendees) from user input.",
                 "parameters": params,
             },
-        }
-    ]
+        },
+    )
 
 
 async def _call_with_tools(client: AsyncOpenAI, model: str, messages: list, tools: list):
-    kwargs = dict(
+    return await create_chat_completion(
+        client,
         model=model,
         messages=messages,
         tools=tools,
         tool_choice={"type": "function", "function": {"name": "extract_calendar_event"}},
         temperature=0,
     )
-    try:
-        return await client.chat.completions.create(**kwargs)
-    except BadRequestError as e:
-        if "temperature" in str(e):
-            logger.info("Model %s rejects temperature=0, retrying without it", model)
-            kwargs.pop("temperature")
-            return await client.chat.completions.create(**kwargs)
-        raise
 
 
 async def extract_calendar_event(
@@ -83,18 +83,11 @@ async def extract_calendar_event(
     end_time (str HH:MM), title (str), attendees (list[str]).
     """
     client = get_openai_client()
-    model = model or os.getenv("OPENAI_CALENDAR_MODEL") or os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
-    schema = _load_schema()
-    template = _load_prompt_template()
-
+    model = model or CALENDAR_MODEL
     current_dt = now_toronto()
-    system_prompt = template.format(
-        current_datetime=current_dt.strftime("%Y-%m-%d %H:%M (%A)"),
-        timezone_name=str(TIMEZONE),
-    )
 
     if context_event:
-        context_json = json.dumps(context_event, ensure_ascii=False)
+        context_json = _json.dumps(context_event)
         user_content = (
             "Context Event (use as defaults if not overridden):\n"
             f"{context_json}\n\n"
@@ -104,11 +97,12 @@ async def extract_calendar_event(
         user_content = user_text
 
     messages = [
-        {"role": "system", "content": system_prompt},
+        {"role": "system", "content": _load_prompt_template()},
+        _datetime_message(current_dt),
         {"role": "user", "content": user_content},
     ]
 
-    tools = _build_tools(schema)
+    tools = list(_get_tools())
 
     logger.info(
         "Calendar extraction: model=%s, lang=%s, context=%s, text=%r",
@@ -123,7 +117,7 @@ async def extract_calendar_event(
     raw = tool_call.function.arguments
     logger.info("Calendar extraction raw: %s", raw[:500])
 
-    parsed = json.loads(raw)
+    parsed = _json.loads(raw)
 
     if context_event:
         if not parsed.get("date"):
@@ -153,7 +147,9 @@ def _normalise_date(value: str, ref: datetime) -> str:
     """Ensure date is YYYY-MM-DD. GPT resolves relative dates via prompt-injected current datetime."""
     if not value:
         return ref.strftime("%Y-%m-%d")
-    # Already ISO
+    # Already ISO; strptime below still accepts unpadded forms
+    if is_iso_date(value):
+        return value
     try:
         datetime.strptime(value, "%Y-%m-%d")
         return value
@@ -171,29 +167,3 @@ def _normalise_date(value: str, ref: datetime) -> str:
     except Exception:
         pass
     return ref.strftime("%Y-%m-%d")
-
-
-def _normalise_time(value: str) -> str:
-    """Ensure time is HH:MM."""
-    if not value:
-        return ""
-    # Already HH:MM
-    try:
-        datetime.strptime(value, "%H:%M")
-        return value
-    except ValueError:
-        pass
-    # Try HH:MM:SS
-    try:
-        t = datetime.strptime(value, "%H:%M:%S")
-        return t.strftime("%H:%M")
-    except ValueError:
-        pass
-    # Try 12-hour formats
-    for fmt in ("%I:%M %p", "%I:%M%p", "%I %p", "%I%p"):
-        try:
-            t = datetime.strptime(value.strip(), fmt)
-            return t.strftime("%H:%M")
-        except ValueError:
-            continue
-    return value
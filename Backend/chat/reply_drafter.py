@@ -1,17 +1,33 @@
 """Generate a reply draft based on transcript, extraction, and RAG evidence."""
 
+import hashlib
 import json
 import logging
 import os
+import re
+from collections import OrderedDict
 from functools import lru_cache
 from pathlib import Path
+from typing import Callable
 
-from openai import AsyncOpenAI, BadRequestError
+from openai import AsyncOpenAI
+
+from chat import _json
+from chat._openai_client import create_chat_completion
 
 logger = logging.getLogger(__name__)
 
 PROMPT_DIR = Path(__file__).resolve().parent / "prompt"
 
+AUTOPILOT_REPLY_MODEL = os.getenv("OPENAI_AUTOPILOT_REPLY_MODEL") or os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
+
+_EVIDENCE_PACK_MAX = 128
+_evidence_packs: OrderedDict[tuple, str] = OrderedDict()
+
+_REPLY_TEXT_START = re.compile(r'"reply_text"\s*:\s*"')
+# A trailing high-surrogate escape must wait for its low half before decoding
+_TRAILING_HIGH_SURROGATE = re.compile(r"\\u[dD][89abAB][0-9a-fA-F]{2}$")
+
 
 @lru_cache(maxsize=4)
 def _load_prompt(name: str = "autopilot_reply_draft.txt") -> str:
@@ -23,32 +39,36 @@ def _load_prompt(name: str = "autopilot_reply_draft.txt") -> str:
 async def generate_reply_draft(
     client: AsyncOpenAI,
     transcript: str,
-    extracted: dict,
+    extracted: dict | str,
     evidence: list[dict],
     *,
     model: str | None = None,
     run_id: str = "",
+    on_text: Callable[[str], None] | None = None,
 ) -> dict:
     """
     Generate a reply draft with citations.
+    extracted may be given as an already-serialized JSON string, which is used verbatim.
     Returns {"reply_text": "...", "citations": [...]}
+    If on_text is given, the completion is streamed and on_text receives each new
+    piece of reply_text as it arrives; the return value is unchanged.
     """
-    model = model or os.getenv("OPENAI_AUTOPILOT_REPLY_MODEL") or os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
+    model = model or AUTOPILOT_REPLY_MODEL
     system_prompt = _load_prompt("autopilot_reply_draft.txt")
 
-    evidence_text = ""
     if evidence:
-        chunks = []
-        for e in evidence:
-            ref = f"{e.get('doc', 'unknown')}#{e.get('chunk', 0)}"
-            chunks.append(f"[{ref}] (score={e.get('score', 0):.3f}):\n{e.get('text', '')}")
-        evidence_text = "\n\n---\n\n".join(chunks)
+        evidence_text = _evidence_pack(evidence)
     else:
         evidence_text = "(No relevant evidence found in the knowledge base.)"
 
+    if isinstance(extracted, str):
+        extracted_json = extracted
+    else:
+        extracted_json = _json.dumps(extracted, indent=True)
+
     user_content = (
         f"## User Transcript\n{transcript}\n\n"
-        f"## Structured Extraction\n```json\n{json.dumps(extracted, indent=2, ensure_ascii=False)}\n```\n\n"
+        f"## Structured Extraction\n```json\n{extracted_json}\n```\n\n"
         f"## Retrieved Evidence\n{evidence_text}"
     )
 
@@ -63,29 +83,109 @@ async def generate_reply_draft(
         temperature=0.2,
         response_format={"type": "json_object"},
     )
-    try:
-        response = await client.chat.completions.create(**kwargs)
-    except BadRequestError as e:
-        if "temperature" in str(e):
-            logger.info("Model %s does not support temperature, retrying without it", model)
-            kwargs.pop("temperature")
-            response = await client.chat.completions.create(**kwargs)
-        elif "response_format" in str(e):
-            logger.info("Model %s does not support response_format, retrying without it", model)
-            kwargs.pop("response_format", None)
-            kwargs.pop("temperature", None)
-            response = await client.chat.completions.create(**kwargs)
-        else:
-            raise
-
-    raw = response.choices[0].message.content
+    if on_text is not None:
+        kwargs["stream"] = True
+    response = await create_chat_completion(client, **kwargs)
+
+    if on_text is not None:
+        raw = await _collect_stream(response, on_text)
+    else:
+        raw = response.choices[0].message.content
     logger.info("[%s] Reply draft generated, length=%d", run_id, len(raw))
 
     try:
-        result = json.loads(raw)
+        result = _json.loads(raw)
         return {
             "reply_text": result.get("reply_text", raw),
             "citations": result.get("citations", []),
         }
     except json.JSONDecodeError:
         return {"reply_text": raw, "citations": []}
+
+
+def _evidence_pack(evidence: list[dict]) -> str:
+    """
+    Render evidence in the retriever's (relevance) order, tagged with a version hash of its
+    doc#chunk refs; memoized on the refs, rounded scores and text hashes, so a hit costs no string building.
+    """
+    key = tuple(
+        (e.get("doc"), e.get("chunk"), round(e.get("score", 0), 3), hash(e.get("text", "")))
+        for e in evidence
+    )
+    cached = _evidence_packs.get(key)
+    if cached is not None:
+        _evidence_packs.move_to_end(key)
+        return cached
+
+    refs = [f"{e.get('doc', 'unknown')}#{e.get('chunk', 0)}" for e in evidence]
+    version = hashlib.md5("|".join(refs).encode()).hexdigest()[:12]
+    chunks = [
+        f"[{ref}] (score={e.get('score', 0):.3f}):\n{e.get('text', '')}"
+        for ref, e in zip(refs, evidence)
+    ]
+    pack = f"# EVIDENCE_PACK_VERSION={version}\n\n" + "\n\n---\n\n".join(chunks)
+    _evidence_packs[key] = pack
+    if len(_evidence_packs) > _EVIDENCE_PACK_MAX:
+        _evidence_packs.popitem(last=False)
+    return pack
+
+
+async def _collect_stream(stream, on_text: Callable[[str], None]) -> str:
+    """Accumulate a streamed completion, forwarding reply_text pieces as they decode."""
+    buffer = ""
+    reply_text = _ReplyTextStream()
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        buffer += delta
+        piece = reply_text.feed(buffer)
+        if piece:
+            on_text(piece)
+    return buffer
+
+
+class _ReplyTextStream:
+    """Decodes the "reply_text" string value out of a JSON object that is still being streamed."""
+
+    def __init__(self):
+        self._pos: int | None = None
+        self._done = False
+
+    def feed(self, buffer: str) -> str:
+        """Return the newly completed part of reply_text in buffer (which only ever grows)."""
+        if self._done:
+            return ""
+        if self._pos is None:
+            m = _REPLY_TEXT_START.search(buffer)
+            if not m:
+                return ""
+            self._pos = m.end()
+        i = self._pos
+        end = len(buffer)
+        while i < end:
+            ch = buffer[i]
+            if ch == "\\":
+                step = 6 if buffer[i + 1:i + 2] == "u" else 2
+                if i + step > end:
+                    break  # escape sequence not fully received yet
+                i += step
+            elif ch == '"':
+                self._done = True
+                break
+            else:
+                i += 1
+        raw = buffer[self._pos:i]
+        if not self._done and _TRAILING_HIGH_SURROGATE.search(raw):
+            raw = raw[:-6]
+        if not raw:
+            return ""
+        try:
+            # strict=False: models do emit raw control characters (e.g. newlines) inside strings
+            piece = json.loads(f'"{raw}"', strict=False)
+        except json.JSONDecodeError:
+            return ""  # hold the fragment back until more deltas complete it
+        self._pos += len(raw)
+        return piece
@@ -1,47 +1,69 @@
 import asyncio
 import base64
+import importlib.util
 import logging
+import multiprocessing
 import os
 import socket
+import struct
 import time
 import uuid
-from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
+from typing import Final
 
 from dotenv import load_dotenv
 load_dotenv(Path(__file__).resolve().parent.parent / ".env")
 
 import uvicorn
 from fastapi import FastAPI, UploadFile, File, HTTPException, Form, WebSocket, WebSocketDisconnect
+from fastapi.middleware import Middleware
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
 from tools.models import VoiceResponse, CalendarCommand
-from tools.file_utils import save_temp_file
 from tools.speech import (
   delta_from_previous,
+  pcm16_to_wav,
   segment_tts_text,
+  stitch_transcript,
   synthesize_speech,
-  transcribe_audio,
+  synthesize_speech_stream,
   transcribe_audio_bytes,
 )
+from chat import _json
 from chat.calendar_extractor import extract_calendar_event
-from tools.calendar_agent import GoogleCalendarAgent
+from tools.calendar_agent import GoogleCalendarAgent, close_browser
+from tools.vad import PCM_SAMPLE_RATE, VAD_FRAME_MS, scan_voiced_frames, webrtc_vad_available
 from api.autopilot import router as autopilot_router
-from store.runs import create_run, update_run
-
-app = FastAPI(title="Voice Schedule Assistant")
+from store.run_queue import flush_runs, queue_create_run, queue_update_run
+from store.runs import get_run
+from utils.datetime_fmt import fast_date as _fast_date, fast_hm as _fast_hm
+from rag.retrieve import warmup as warm_rag_index
+
+# Explicit lists let preflights be answered without reflecting the requested headers/methods.
+# The frontend's axios instance sends X-Custom-Header on every request.
+CORS_ORIGINS = frozenset({"http://localhost:5173", "http://127.0.0.1:5173"})
+CORS_METHODS = ("GET", "POST", "OPTIONS")
+CORS_HEADERS = ("content-type", "authorization", "x-custom-header")
+
+app = FastAPI(
+  title="Voice Schedule Assistant",
+  middleware=[
+    Middleware(
+      CORSMiddleware,
+      allow_origins=CORS_ORIGINS,
+      allow_credentials=True,
+      allow_methods=CORS_METHODS,
+      allow_headers=CORS_HEADERS,
+    ),
+  ],
+)
 app.include_router(autopilot_router)
 logger = logging.getLogger(__name__)
 
-app.add_middleware(
-  CORSMiddleware,
-  allow_origins=["http://localhost:5173", "http://127.0.0.1:5173"],
-  allow_credentials=True,
-  allow_methods=["*"],
-  allow_headers=["*"],
-)
-
 MESSAGES = {
   "zh": {
     "no_audio": "未收到音频文件",
@@ -91,46 +113,162 @@ LOG_MESSAGES = {
   },
 }
 
+# Bound format_map of every MESSAGES template that has slots, e.g. MESSAGE_TEMPLATES["en"]["create_ok"](slots)
+MESSAGE_TEMPLATES = {
+  lang: {key: template.format_map for key, template in msgs.items() if "{" in template}
+  for lang, msgs in MESSAGES.items()
+}
+
 VOICE_SESSION_TTL_SECONDS = 1800
-VOICE_SESSIONS: dict[str, dict] = {}
+VOICE_SESSION_MAX_ENTRIES = int(os.getenv("VOICE_SESSION_MAX_ENTRIES", "10000"))
+# session_id -> (monotonic expiry, session), least recently written first
+VOICE_SESSIONS: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+STREAM_STT_UPDATE_MS: Final[int] = int(os.getenv("STREAM_STT_UPDATE_MS", "350"))
+NS_PER_MS: Final[int] = 1_000_000
+# Wall-clock stream timing uses integer time.monotonic_ns(); audio durations stay in ms
+STREAM_STT_UPDATE_NS: Final[int] = STREAM_STT_UPDATE_MS * NS_PER_MS
+STREAM_STT_MIN_BYTES: Final[int] = int(os.getenv("STREAM_STT_MIN_BYTES", "2000"))
+STREAM_STT_PARTIAL_DEBOUNCE_N: Final[int] = int(os.getenv("STREAM_STT_PARTIAL_DEBOUNCE_N", "2"))
+STREAM_STT_MIN_SPEECH_MS: Final[int] = int(os.getenv("STREAM_STT_MIN_SPEECH_MS", "350"))
+STREAM_STT_SILENCE_MS: Final[int] = int(os.getenv("STREAM_STT_SILENCE_MS", "900"))
+# webrtcvad on raw PCM streams is reliable enough for a shorter hangover
+STREAM_VAD_SILENCE_MS: Final[int] = int(os.getenv("STREAM_VAD_SILENCE_MS", "400"))
+STREAM_STT_MAX_AUDIO_MS: Final[int] = int(os.getenv("STREAM_STT_MAX_AUDIO_MS", "25000"))
+STREAM_STT_ENERGY_THRESHOLD: Final[float] = float(os.getenv("STREAM_STT_ENERGY_THRESHOLD", "0.02"))
+# Partial passes only re-transcribe the uncommitted tail; it is committed once it spans this much audio
+STREAM_STT_WINDOW_MS: Final[int] = int(os.getenv("STREAM_STT_WINDOW_MS", "6000"))
+STREAM_STT_CARRYOVER_MS: Final[int] = int(os.getenv("STREAM_STT_CARRYOVER_MS", "300"))
+STREAM_DEFAULT_CHUNK_MS: Final[int] = int(os.getenv("STREAM_DEFAULT_CHUNK_MS", "80"))
+STREAM_TTS_WORKERS: Final[int] = int(os.getenv("STREAM_TTS_WORKERS", "2"))
+
+# STT_WORKERS > 0 moves streaming STT into worker processes, each holding its own Whisper model
+STT_WORKERS = int(os.getenv("STT_WORKERS", "0"))
+_stt_executor: ProcessPoolExecutor | None = None
+# Process-wide cap on concurrent STT calls; streaming partials are skipped rather than queued when it is full
+STT_CONCURRENCY = max(1, int(os.getenv("STT_CONCURRENCY", "4")))
+_stt_semaphore = asyncio.Semaphore(STT_CONCURRENCY)
+
+# Initial stream buffer size per ms of STREAM_STT_MAX_AUDIO_MS: 16 kHz s16le PCM, ~64 kbps opus/webm
+PCM_BYTES_PER_MS = 32
+WEBM_BYTES_PER_MS = 8
+
+# Audio larger than this is base64-encoded in a worker thread
+B64_OFFLOAD_BYTES = 32 * 1024
+
+# Binary websocket frames (opt-in alternative to base64-in-JSON audio)
+AUDIO_FRAME_HEADER = struct.Struct("<BHH")
+AUDIO_FRAME_TYPE_CHUNK = 1
+TTS_FRAME_HEADER_LEN = struct.Struct("<I")
+
+
+def _init_stt_worker() -> None:
+  import tools.speech  # noqa: F401  loads the Whisper model once per worker process
+
+
+async def _run_stt(func, *args):
+  """Run a blocking STT call in the process pool when configured, otherwise in a thread."""
+  global _stt_executor
+  if STT_WORKERS <= 0:
+    return await asyncio.to_thread(func, *args)
+  if _stt_executor is None:
+    # spawn, not fork: the parent's CTranslate2 threads do not survive a fork
+    _stt_executor = ProcessPoolExecutor(
+      max_workers=STT_WORKERS,
+      mp_context=multiprocessing.get_context("spawn"),
+      initializer=_init_stt_worker,
+    )
+  return await asyncio.get_running_loop().run_in_executor(_stt_executor, func, *args)
+
+
+async def _transcribe_bytes(audio: bytes, lang: str) -> str:
+  async with _stt_semaphore:
+    return await _run_stt(transcribe_audio_bytes, audio, lang)
+
 
-STREAM_STT_UPDATE_MS = int(os.getenv("STREAM_STT_UPDATE_MS", "350"))
-STREAM_STT_MIN_BYTES = int(os.getenv("STREAM_STT_MIN_BYTES", "2000"))
-STREAM_STT_PARTIAL_DEBOUNCE_N = int(os.getenv("STREAM_STT_PARTIAL_DEBOUNCE_N", "2"))
-STREAM_STT_MIN_SPEECH_MS = int(os.getenv("STREAM_STT_MIN_SPEECH_MS", "350"))
-STREAM_STT_SILENCE_MS = int(os.getenv("STREAM_STT_SILENCE_MS", "900"))
-STREAM_STT_MAX_AUDIO_MS = int(os.getenv("STREAM_STT_MAX_AUDIO_MS", "25000"))
-STREAM_STT_ENERGY_THRESHOLD = float(os.getenv("STREAM_STT_ENERGY_THRESHOLD", "0.02"))
-STREAM_DEFAULT_CHUNK_MS = int(os.getenv("STREAM_DEFAULT_CHUNK_MS", "80"))
-STREAM_TTS_WORKERS = int(os.getenv("STREAM_TTS_WORKERS", "2"))
+@app.on_event("shutdown")
+async def _flush_run_writes() -> None:
+  lost = await flush_runs()
+  if lost:
+    logger.warning("Run records with dropped writes: %s", ", ".join(sorted(lost)))
+
+
+@app.on_event("shutdown")
+async def _close_calendar_browser() -> None:
+  await asyncio.to_thread(close_browser)
+
+
+@app.on_event("shutdown")
+def _shutdown_stt_executor() -> None:
+  if _stt_executor is not None:
+    _stt_executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _warmup() -> None:
+  """Pay the first-call costs (STT worker/model, edge-tts connection, calendar agents, RAG index) up front."""
+  started = time.monotonic()
+  silence = pcm16_to_wav(bytes(PCM_SAMPLE_RATE // 2), PCM_SAMPLE_RATE)  # 250 ms
+  steps = (
+    ("stt", lambda: _run_stt(transcribe_audio_bytes, silence, "en")),
+    ("tts", lambda: synthesize_speech("Hi", lang="en")),
+    ("calendar", lambda: asyncio.to_thread(lambda: [_calendar_agent(lang) for lang in ("zh", "en")])),
+    ("rag", lambda: asyncio.to_thread(warm_rag_index)),
+  )
+  for name, step in steps:
+    try:
+      await step()
+    except Exception as e:
+      logger.warning("Warmup step %s failed: %s", name, e)
+  logger.info("Warmup finished in %.1fs", time.monotonic() - started)
 
 
-def _now_utc() -> datetime:
-  return datetime.utcnow()
+@app.on_event("startup")
+async def _start_warmup() -> None:
+  if os.getenv("BACKEND_WARMUP", "1").lower() in ("1", "true", "yes", "on"):
+    # In the background so a slow TTS endpoint cannot hold up startup
+    app.state.warmup_task = asyncio.create_task(_warmup())
+
+
+def _b64encode_text(data: bytes) -> str:
+  return base64.b64encode(data).decode("utf-8")
+
+
+async def _b64encode(data: bytes) -> str:
+  """Base64 for JSON payloads; large TTS clips are encoded off the event loop."""
+  if len(data) < B64_OFFLOAD_BYTES:
+    return _b64encode_text(data)
+  return await asyncio.to_thread(_b64encode_text, data)
 
 
 def _get_voice_session(session_id: str | None) -> dict | None:
   if not session_id:
     return None
-  session = VOICE_SESSIONS.get(session_id)
-  if not session:
+  entry = VOICE_SESSIONS.get(session_id)
+  if entry is None:
     return None
-  age = (_now_utc() - session.get("updated_at", _now_utc())).total_seconds()
-  if age > VOICE_SESSION_TTL_SECONDS:
-    try:
-      del VOICE_SESSIONS[session_id]
-    except Exception:
-      pass
+  expires_at, session = entry
+  if time.monotonic() > expires_at:
+    VOICE_SESSIONS.pop(session_id, None)
     return None
   return session
 
 
 def _set_voice_session(session_id: str, event: dict, awaiting_update: bool) -> None:
-  VOICE_SESSIONS[session_id] = {
-    "event": event,
-    "awaiting_update": awaiting_update,
-    "updated_at": _now_utc(),
-  }
+  now = time.monotonic()
+  VOICE_SESSIONS[session_id] = (
+    now + VOICE_SESSION_TTL_SECONDS,
+    {
+      "event": event,
+      "awaiting_update": awaiting_update,
+    },
+  )
+  VOICE_SESSIONS.move_to_end(session_id)
+  # Oldest entries sit at the front, so expired and over-capacity sessions are evicted from there
+  while VOICE_SESSIONS:
+    oldest_expiry = next(iter(VOICE_SESSIONS.values()))[0]
+    if oldest_expiry >= now and len(VOICE_SESSIONS) <= VOICE_SESSION_MAX_ENTRIES:
+      break
+    VOICE_SESSIONS.popitem(last=False)
 
 
 async def _build_voice_response(
@@ -144,7 +282,7 @@ async def _build_voice_response(
   if include_audio:
     try:
       audio_bytes = await synthesize_speech(ai_text, lang=lang)
-      audio_b64 = base64.b64encode(audio_bytes).decode("utf-8")
+      audio_b64 = await _b64encode(audio_bytes)
     except Exception as e:
       logger.exception("%s: %s", _msg(lang, "tts_failed", LOG_MESSAGES), e)
       audio_b64 = ""
@@ -156,6 +294,11 @@ async def _build_voice_response(
   )
 
 
+@lru_cache(maxsize=4)
+def _calendar_agent(lang: str) -> GoogleCalendarAgent:
+  return GoogleCalendarAgent(lang=lang)
+
+
 async def _process_calendar_text(
   user_text: str,
   normalized_lang: str,
@@ -177,8 +320,25 @@ async def _process_calendar_text(
     session_id = str(uuid.uuid4())
 
   run_id = session_id
-  from store.runs import get_run
-  existing_run = get_run(run_id)
+  session = _get_voice_session(session_id)
+  context_event = session.get("event") if session and session.get("awaiting_update") else None
+
+  # The LLM call is the long pole; start it before the run-history read so the two overlap
+  extract_task = asyncio.create_task(
+    extract_calendar_event(
+      user_text,
+      lang=normalized_lang,
+      context_event=context_event,
+    )
+  )
+  try:
+    # Earlier turns of this session may still be queued
+    if run_id in await flush_runs():
+      logger.warning("Earlier writes for run %s were dropped; its stored transcript may be incomplete", run_id)
+    existing_run = await asyncio.to_thread(get_run, run_id)
+  except BaseException:
+    extract_task.cancel()
+    raise
 
   if existing_run:
     existing_transcript = existing_run.get("transcript", "")
@@ -188,58 +348,47 @@ async def _process_calendar_text(
       full_transcript = user_text
   else:
     full_transcript = user_text
-    try:
-      create_run(run_id, input_type, user_text, run_type="voice_schedule")
-    except Exception:
-      pass
-
-  session = _get_voice_session(session_id)
-  context_event = session.get("event") if session and session.get("awaiting_update") else None
+    queue_create_run(run_id, input_type, user_text, run_type="voice_schedule")
 
   try:
-    extracted = await extract_calendar_event(
-      user_text,
-      lang=normalized_lang,
-      context_event=context_event,
-    )
-    update_run(run_id, transcript=full_transcript, extracted_json=extracted, status="extracted")
+    extracted = await extract_task
+    queue_update_run(run_id, transcript=full_transcript, extracted_json=extracted, status="extracted")
 
     cmd = CalendarCommand(
-      date=datetime.strptime(extracted["date"], "%Y-%m-%d").date(),
-      start_time=datetime.strptime(extracted["start_time"], "%H:%M").time(),
-      end_time=datetime.strptime(extracted["end_time"], "%H:%M").time(),
+      # Split-based parsing: cheaper than strptime and, unlike fromisoformat, accepts unpadded dates
+      date=_fast_date(extracted["date"]),
+      start_time=_fast_hm(extracted["start_time"]),
+      end_time=_fast_hm(extracted["end_time"]),
       title=extracted.get("title", "Meeting" if normalized_lang == "en" else "日程安排"),
     )
   except Exception as e:
     logger.exception("%s: %s", _msg(normalized_lang, "nlp_failed", LOG_MESSAGES), e)
-    update_run(run_id, status="error", error=str(e)[:1000])
+    queue_update_run(run_id, status="error", error=str(e)[:1000])
     ai_text = msgs["nlp_failed"]
     return await _build_voice_response(user_text, ai_text, normalized_lang, session_id, include_audio)
 
-  agent = GoogleCalendarAgent(lang=normalized_lang)
+  agent = _calendar_agent(normalized_lang)
   result = await asyncio.to_thread(agent.check_and_create_event, cmd)
 
+  templates = MESSAGE_TEMPLATES[normalized_lang]
+  slots = {
+    "date": cmd.date.isoformat(),
+    "start": cmd.start_time.isoformat("minutes"),
+    "end": cmd.end_time.isoformat("minutes"),
+    "title": cmd.title,
+  }
   if result.success:
-    ai_text = msgs["create_ok"].format(
-      date=cmd.date.strftime("%Y-%m-%d"),
-      start=cmd.start_time.strftime("%H:%M"),
-      end=cmd.end_time.strftime("%H:%M"),
-      title=cmd.title,
-    )
+    ai_text = templates["create_ok"](slots)
     _set_voice_session(session_id, extracted, awaiting_update=False)
-    update_run(run_id, status="executed", actions_json={"action": "create_calendar", "success": True, "result": ai_text})
+    queue_update_run(run_id, status="executed", actions_json={"action": "create_calendar", "success": True, "result": ai_text})
   elif result.conflict:
-    ai_text = msgs["conflict_retry"].format(
-      date=cmd.date.strftime("%Y-%m-%d"),
-      start=cmd.start_time.strftime("%H:%M"),
-      end=cmd.end_time.strftime("%H:%M"),
-    )
+    ai_text = templates["conflict_retry"](slots)
     _set_voice_session(session_id, extracted, awaiting_update=True)
-    update_run(run_id, status="conflict", actions_json={"action": "create_calendar", "conflict": True})
+    queue_update_run(run_id, status="conflict", actions_json={"action": "create_calendar", "conflict": True})
   else:
     ai_text = result.message or msgs["create_failed"]
     _set_voice_session(session_id, extracted, awaiting_update=False)
-    update_run(run_id, status="error", error=result.message or "Failed to create calendar event")
+    queue_update_run(run_id, status="error", error=result.message or "Failed to create calendar event")
 
   return await _build_voice_response(user_text, ai_text, normalized_lang, session_id, include_audio)
 
@@ -255,20 +404,40 @@ def _msg(lang: str, key: str, table: dict) -> str:
   return table.get(lang, table["zh"]).get(key, key)
 
 
-def _new_stream_state(lang: str, session_id: str | None, include_audio: bool) -> dict:
+def _new_stream_state(
+  lang: str,
+  session_id: str | None,
+  include_audio: bool,
+  binary_audio: bool = False,
+  audio_format: str = "webm",
+  stream_tts: bool = False,
+) -> dict:
+  pcm16 = audio_format == "pcm16"
   return {
     "lang": _normalize_lang(lang),
     "session_id": session_id or str(uuid.uuid4()),
     "include_audio": include_audio,
-    "audio_buffer": bytearray(),
-    "last_stt_ts_ms": 0.0,
+    "binary_audio": binary_audio,
+    "stream_tts": stream_tts,
+    "pcm16": pcm16,
+    "vad_offset": 0,
+    "silence_ns": (STREAM_VAD_SILENCE_MS if pcm16 and webrtc_vad_available() else STREAM_STT_SILENCE_MS) * NS_PER_MS,
+    # Preallocated; only the first audio_len bytes are valid (see _append_audio)
+    "audio_buffer": bytearray(STREAM_STT_MAX_AUDIO_MS * (PCM_BYTES_PER_MS if pcm16 else WEBM_BYTES_PER_MS)),
+    "audio_len": 0,
+    # (byte offset, audio ms) at the start of each received chunk
+    "chunk_marks": [],
+    "committed_chunk": 0,
+    "committed_text": "",
+    "stt_window": (0, 0),
+    "last_stt_ts_ns": 0,
     "stt_task": None,
     "partial_candidate": "",
     "partial_repeats": 0,
     "last_partial_sent": "",
     "voiced_ms": 0,
     "total_audio_ms": 0,
-    "last_voice_ts_ms": 0.0,
+    "last_voice_ts_ns": 0,
   }
 
 
@@ -284,21 +453,158 @@ def _normalize_energy(value: object) -> float:
   return parsed
 
 
+async def _ws_send(websocket: WebSocket, payload: dict | bytes) -> None:
+  """Queue a message on the connection's outbox, or send it directly when there is no writer."""
+  outbox = getattr(websocket.state, "outbox", None)
+  if outbox is not None:
+    outbox.put_nowait(payload)
+  elif isinstance(payload, bytes):
+    await websocket.send_bytes(payload)
+  else:
+    await websocket.send_text(_json.dumps(payload))
+
+
+async def _ws_writer(websocket: WebSocket, outbox: asyncio.Queue, batch: bool) -> None:
+  """Single writer per connection; drains everything queued in the same tick at once.
+
+  With batching enabled (?batch=1), adjacent JSON messages go out as one JSON array frame.
+  """
+  while True:
+    items = [await outbox.get()]
+    while not outbox.empty():
+      items.append(outbox.get_nowait())
+
+    pending_json: list[dict] = []
+    for item in items:
+      if isinstance(item, dict):
+        pending_json.append(item)
+        continue
+      await _ws_flush_json(websocket, pending_json, batch)
+      pending_json = []
+      if item is None:
+        return
+      await websocket.send_bytes(item)
+    await _ws_flush_json(websocket, pending_json, batch)
+
+
+async def _ws_flush_json(websocket: WebSocket, messages: list[dict], batch: bool) -> None:
+  if batch and len(messages) > 1:
+    await websocket.send_text(_json.dumps(messages))
+    return
+  for message in messages:
+    await websocket.send_text(_json.dumps(message))
+
+
+def _parse_audio_frame(frame: bytes) -> tuple[memoryview, int, float] | None:
+  """Binary audio frame: <BHH header (type, duration_ms, energy * 32767) followed by raw audio."""
+  if len(frame) < AUDIO_FRAME_HEADER.size:
+    return None
+  frame_type, duration_ms, energy_q15 = AUDIO_FRAME_HEADER.unpack_from(frame, 0)
+  if frame_type != AUDIO_FRAME_TYPE_CHUNK:
+    return None
+  return memoryview(frame)[AUDIO_FRAME_HEADER.size:], duration_ms, energy_q15 / 32767
+
+
+def _tts_chunk_frame(header: dict, audio_bytes: bytes) -> bytes:
+  """Binary tts_chunk: <I JSON-header length, the JSON header, then the raw audio."""
+  header_bytes = _json.dumps(header).encode("utf-8")
+  return TTS_FRAME_HEADER_LEN.pack(len(header_bytes)) + header_bytes + audio_bytes
+
+
+async def _handle_audio_chunk(
+  websocket: WebSocket,
+  state: dict,
+  chunk_bytes: bytes | memoryview,
+  duration_ms: object,
+  energy: object,
+) -> bool:
+  """Buffer one audio chunk; returns True once the stream has been finalized."""
+  if not chunk_bytes:
+    return False
+  state["chunk_marks"].append((state["audio_len"], state["total_audio_ms"]))
+  _append_audio(state, chunk_bytes)
+
+  chunk_ms = int(duration_ms or STREAM_DEFAULT_CHUNK_MS)
+  chunk_ms = max(10, min(chunk_ms, 1000))
+  state["total_audio_ms"] += chunk_ms
+
+  now_ns = time.monotonic_ns()
+  if state["pcm16"]:
+    _update_vad(state, now_ns)
+  elif _normalize_energy(energy) >= STREAM_STT_ENERGY_THRESHOLD:
+    state["voiced_ms"] += chunk_ms
+    state["last_voice_ts_ns"] = now_ns
+
+  await _schedule_partial_stt(state)
+  await _emit_partial_if_ready(websocket, state)
+
+  if state["total_audio_ms"] >= STREAM_STT_MAX_AUDIO_MS:
+    await _finalize_stream(websocket, state, final_reason="max_duration")
+    return True
+
+  if _should_finalize_by_silence(state, now_ns):
+    await _finalize_stream(websocket, state, final_reason="silence_timeout")
+    return True
+
+  return False
+
+
+def _append_audio(state: dict, chunk_bytes: bytes | memoryview) -> None:
+  """Copy a chunk into the preallocated buffer, doubling it only if the client overruns the estimate."""
+  start = state["audio_len"]
+  end = start + len(chunk_bytes)
+  buffer = state["audio_buffer"]
+  if end > len(buffer):
+    grown = bytearray(max(end, len(buffer) * 2))
+    grown[:start] = memoryview(buffer)[:start]
+    state["audio_buffer"] = buffer = grown
+  buffer[start:end] = chunk_bytes
+  state["audio_len"] = end
+
+
+def _audio_view(state: dict) -> memoryview:
+  return memoryview(state["audio_buffer"])[:state["audio_len"]]
+
+
+def _update_vad(state: dict, now_ns: int) -> None:
+  """Classify the whole 20 ms frames received since the last call (webrtcvad, else RMS energy)."""
+  flags, state["vad_offset"] = scan_voiced_frames(_audio_view(state), state["vad_offset"])
+  if not any(flags):
+    return
+  state["voiced_ms"] += flags.count(True) * VAD_FRAME_MS
+  trailing_silence = flags[::-1].index(True)
+  state["last_voice_ts_ns"] = now_ns - trailing_silence * VAD_FRAME_MS * NS_PER_MS
+
+
+def _stt_input(state: dict, start_chunk: int = 0) -> bytes:
+  """Audio to transcribe: from `start_chunk` for raw PCM, always the whole buffer for WebM."""
+  audio = _audio_view(state)
+  if state["pcm16"]:
+    offset = state["chunk_marks"][start_chunk][0] & ~1 if start_chunk else 0
+    return pcm16_to_wav(audio[offset:], PCM_SAMPLE_RATE)
+  # WebM clusters can't be cut at arbitrary chunk boundaries without corrupting the container
+  return audio.tobytes()
+
+
 async def _schedule_partial_stt(state: dict) -> None:
-  now_ms = time.monotonic() * 1000
-  if (now_ms - state["last_stt_ts_ms"]) < STREAM_STT_UPDATE_MS:
+  now_ns = time.monotonic_ns()
+  if (now_ns - state["last_stt_ts_ns"]) < STREAM_STT_UPDATE_NS:
     return
-  if len(state["audio_buffer"]) < STREAM_STT_MIN_BYTES:
+  if state["audio_len"] < STREAM_STT_MIN_BYTES:
     return
   task = state.get("stt_task")
   if task and not task.done():
     return
+  if _stt_semaphore.locked():
+    return
 
-  snapshot = bytes(state["audio_buffer"])
+  start = state["committed_chunk"]
+  snapshot = _stt_input(state, start)
   lang = state["lang"]
-  state["last_stt_ts_ms"] = now_ms
+  state["stt_window"] = (start, len(state["chunk_marks"]))
+  state["last_stt_ts_ns"] = now_ns
   state["stt_task"] = asyncio.create_task(
-    asyncio.to_thread(transcribe_audio_bytes, snapshot, lang)
+    _transcribe_bytes(snapshot, lang)
   )
 
 
@@ -309,14 +615,17 @@ async def _emit_partial_if_ready(websocket: WebSocket, state: dict) -> None:
   state["stt_task"] = None
 
   try:
-    partial_text = (task.result() or "").strip()
+    tail_text = (task.result() or "").strip()
   except Exception:
     logger.exception("Partial STT failed")
     return
 
-  if not partial_text:
+  if not tail_text:
     return
 
+  partial_text = stitch_transcript(state["committed_text"], tail_text)
+  _maybe_commit_window(state, partial_text)
+
   if partial_text == state["partial_candidate"]:
     state["partial_repeats"] += 1
   else:
@@ -331,7 +640,8 @@ async def _emit_partial_if_ready(websocket: WebSocket, state: dict) -> None:
 
   delta = delta_from_previous(state["last_partial_sent"], partial_text)
   state["last_partial_sent"] = partial_text
-  await websocket.send_json(
+  await _ws_send(
+    websocket,
     {
       "type": "stt_partial",
       "text": partial_text,
@@ -340,93 +650,139 @@ async def _emit_partial_if_ready(websocket: WebSocket, state: dict) -> None:
   )
 
 
-def _should_finalize_by_silence(state: dict, now_ms: float) -> bool:
+def _maybe_commit_window(state: dict, window_text: str) -> None:
+  """Once the transcribed window is long enough, freeze its text and restart just before its end."""
+  if not state["pcm16"]:  # WebM partials always cover the whole buffer
+    return
+  start, end = state["stt_window"]
+  marks = state["chunk_marks"]
+  if end <= start or end > len(marks):
+    return
+  window_end_ms = state["total_audio_ms"] if end == len(marks) else marks[end][1]
+  if window_end_ms - marks[start][1] < STREAM_STT_WINDOW_MS:
+    return
+  carry_from_ms = window_end_ms - STREAM_STT_CARRYOVER_MS
+  next_start = end - 1
+  while next_start > start + 1 and marks[next_start - 1][1] >= carry_from_ms:
+    next_start -= 1
+  state["committed_chunk"] = max(next_start, 1)
+  state["committed_text"] = window_text
+
+
+def _should_finalize_by_silence(state: dict, now_ns: int) -> bool:
   if state["voiced_ms"] < STREAM_STT_MIN_SPEECH_MS:
     return False
-  last_voice_ts_ms = state.get("last_voice_ts_ms", 0.0)
-  if last_voice_ts_ms <= 0:
+  last_voice_ts_ns = state.get("last_voice_ts_ns", 0)
+  if last_voice_ts_ns <= 0:
     return False
-  return (now_ms - last_voice_ts_ms) >= STREAM_STT_SILENCE_MS
+  return (now_ns - last_voice_ts_ns) >= state["silence_ns"]
+
 
+async def _send_tts_audio(websocket: WebSocket, header: dict, audio: bytes, binary_audio: bool) -> None:
+  if binary_audio:
+    await _ws_send(websocket, _tts_chunk_frame(header, audio))
+  else:
+    await _ws_send(websocket, {**header, "audio_base64": await _b64encode(audio)})
 
-async def _stream_tts_chunks(websocket: WebSocket, text: str, lang: str) -> None:
+
+async def _stream_tts_chunks(
+  websocket: WebSocket,
+  text: str,
+  lang: str,
+  binary_audio: bool = False,
+  stream_audio: bool = False,
+) -> None:
+  """Synthesize segments concurrently and send them in order.
+
+  By default each segment goes out as one tts_chunk with its full audio. With stream_audio,
+  the current segment's audio is forwarded as tts_chunk_part packets while edge-tts produces
+  it, followed by an audio-less tts_chunk marking the segment boundary.
+  """
   segments = segment_tts_text(text)
   if not segments:
-    await websocket.send_json({"type": "tts_done", "interrupted": False})
+    await _ws_send(websocket, {"type": "tts_done", "interrupted": False})
     return
 
   worker_count = max(1, min(STREAM_TTS_WORKERS, len(segments)))
   job_queue: asyncio.Queue = asyncio.Queue()
-  result_queue: asyncio.Queue = asyncio.Queue()
-
   for seq, seg_text in enumerate(segments):
-    await job_queue.put((seq, seg_text))
-  for _ in range(worker_count):
-    await job_queue.put(None)
+    job_queue.put_nowait((seq, seg_text))
+  # Per segment: audio pieces, then None when complete or the exception that stopped it
+  piece_queues: list[asyncio.Queue] = [asyncio.Queue() for _ in segments]
 
   async def worker() -> None:
-    while True:
-      item = await job_queue.get()
-      if item is None:
-        await result_queue.put(("worker_done", None))
-        return
-
-      seq, seg_text = item
+    while not job_queue.empty():
+      seq, seg_text = job_queue.get_nowait()
+      pieces = piece_queues[seq]
       try:
-        audio_bytes = await synthesize_speech(seg_text, lang=lang)
-        await result_queue.put(("segment", (seq, seg_text, audio_bytes, "")))
+        async for audio_piece in synthesize_speech_stream(seg_text, lang=lang):
+          pieces.put_nowait(audio_piece)
+        pieces.put_nowait(None)
       except Exception as e:
         logger.exception("TTS chunk synth failed at seq=%s", seq)
-        await result_queue.put(("segment", (seq, seg_text, b"", str(e))))
+        pieces.put_nowait(e)
 
   workers = [asyncio.create_task(worker()) for _ in range(worker_count)]
-
-  pending: dict[int, tuple[str, bytes, str]] = {}
-  next_seq = 0
   last_seq = len(segments) - 1
-  done_workers = 0
 
   try:
-    while done_workers < worker_count:
-      kind, payload = await result_queue.get()
-      if kind == "worker_done":
-        done_workers += 1
-        continue
-
-      seq, seg_text, audio_bytes, err = payload
-      pending[seq] = (seg_text, audio_bytes, err)
-
-      while next_seq in pending:
-        chunk_text, chunk_audio, chunk_err = pending.pop(next_seq)
-        is_final = next_seq == last_seq
-
-        if chunk_audio:
-          await websocket.send_json(
-            {
-              "type": "tts_chunk",
-              "sequence": next_seq,
-              "text": chunk_text,
-              "audio_base64": base64.b64encode(chunk_audio).decode("utf-8"),
-              "is_final": is_final,
-            }
-          )
-        elif chunk_err:
-          await websocket.send_json(
-            {
-              "type": "tts_error",
-              "sequence": next_seq,
-              "message": chunk_err[:200],
-              "is_final": is_final,
-            }
-          )
-        next_seq += 1
+    for seq, seg_text in enumerate(segments):
+      is_final = seq == last_seq
+      pieces = piece_queues[seq]
+      audio = bytearray()
+      error: Exception | None = None
+      while True:
+        item = await pieces.get()
+        if item is None:
+          break
+        if isinstance(item, Exception):
+          error = item
+          break
+        if stream_audio:
+          await _send_tts_audio(websocket, {"type": "tts_chunk_part", "sequence": seq}, item, binary_audio)
+        else:
+          audio.extend(item)
+
+      if error is not None:
+        await _ws_send(
+          websocket,
+          {
+            "type": "tts_error",
+            "sequence": seq,
+            "message": str(error)[:200],
+            "is_final": is_final,
+          }
+        )
+      elif stream_audio:
+        await _ws_send(
+          websocket,
+          {
+            "type": "tts_chunk",
+            "sequence": seq,
+            "text": seg_text,
+            "is_final": is_final,
+            "streamed": True,
+          }
+        )
+      elif audio:
+        await _send_tts_audio(
+          websocket,
+          {
+            "type": "tts_chunk",
+            "sequence": seq,
+            "text": seg_text,
+            "is_final": is_final,
+          },
+          bytes(audio),
+          binary_audio,
+        )
   finally:
     for task in workers:
       if not task.done():
         task.cancel()
     await asyncio.gather(*workers, return_exceptions=True)
 
-  await websocket.send_json({"type": "tts_done", "interrupted": False})
+  await _ws_send(websocket, {"type": "tts_done", "interrupted": False})
 
 
 async def _finalize_stream(
@@ -443,20 +799,17 @@ async def _finalize_stream(
   state["stt_task"] = None
 
   final_text = ""
-  if state["audio_buffer"]:
+  if state["audio_len"]:
     try:
-      final_text = await asyncio.to_thread(
-        transcribe_audio_bytes,
-        bytes(state["audio_buffer"]),
-        state["lang"],
-      )
+      final_text = await _transcribe_bytes(_stt_input(state), state["lang"])
     except Exception:
       logger.exception("Final STT failed")
       final_text = ""
   final_text = (final_text or "").strip()
 
   final_delta = delta_from_previous(state["last_partial_sent"], final_text)
-  await websocket.send_json(
+  await _ws_send(
+    websocket,
     {
       "type": "stt_final",
       "text": final_text,
@@ -473,7 +826,8 @@ async def _finalize_stream(
     input_type="audio",
   )
 
-  await websocket.send_json(
+  await _ws_send(
+    websocket,
     {
       "type": "ai_response",
       "user_text": response.user_text,
@@ -483,9 +837,16 @@ async def _finalize_stream(
   )
 
   if state["include_audio"] and response.ai_text:
-    await _stream_tts_chunks(websocket, response.ai_text, state["lang"])
+    await _stream_tts_chunks(
+      websocket,
+      response.ai_text,
+      state["lang"],
+      binary_audio=state["binary_audio"],
+      stream_audio=state["stream_tts"],
+    )
 
-  await websocket.send_json(
+  await _ws_send(
+    websocket,
     {
       "type": "done",
       "session_id": response.session_id,
@@ -516,7 +877,7 @@ async def tts(request: TTSRequest):
   except Exception as e:
     logger.exception("%s: %s", _msg(normalized_lang, "tts_failed", LOG_MESSAGES), e)
     raise HTTPException(status_code=500, detail=_msg(normalized_lang, "tts_failed", HTTP_MESSAGES))
-  audio_b64 = base64.b64encode(audio_bytes).decode("utf-8")
+  audio_b64 = await _b64encode(audio_bytes)
   return {"audio_base64": audio_b64}
 
 
@@ -536,10 +897,9 @@ async def handle_voice(
   if text and text.strip():
     return await _process_calendar_text(text.strip(), normalized_lang, session_id, bool(include_audio), input_type="text")
 
-  temp_path = save_temp_file(audio)
-
   try:
-    user_text = transcribe_audio(temp_path, lang=normalized_lang)
+    audio_bytes = await audio.read()
+    user_text = await _transcribe_bytes(audio_bytes, normalized_lang)
     return await _process_calendar_text(user_text, normalized_lang, session_id, bool(include_audio), input_type="audio")
 
   except HTTPException:
@@ -547,22 +907,35 @@ async def handle_voice(
   except Exception as e:
     logger.exception("%s: %s", _msg(normalized_lang, "voice_error", LOG_MESSAGES), e)
     raise HTTPException(status_code=500, detail=_msg(normalized_lang, "voice_processing_failed", HTTP_MESSAGES))
-  finally:
-    try:
-      os.remove(temp_path)
-    except Exception:
-      pass
 
 
 @app.websocket("/voice/ws")
 async def handle_voice_ws(websocket: WebSocket):
   await websocket.accept()
   state = _new_stream_state(lang="zh", session_id=None, include_audio=True)
+  outbox: asyncio.Queue = asyncio.Queue()
+  batch = websocket.query_params.get("batch", "").lower() in ("1", "true", "yes", "on")
+  writer = asyncio.create_task(_ws_writer(websocket, outbox, batch))
+  websocket.state.outbox = outbox
 
   try:
     while True:
       await _emit_partial_if_ready(websocket, state)
-      packet = await websocket.receive_json()
+      message = await websocket.receive()
+      if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+
+      frame = message.get("bytes")
+      if frame is not None:
+        parsed = _parse_audio_frame(frame)
+        if parsed is None:
+          continue
+        chunk_bytes, duration_ms, energy = parsed
+        if await _handle_audio_chunk(websocket, state, chunk_bytes, duration_ms, energy):
+          return
+        continue
+
+      packet = _json.loads(message.get("text") or "null")
       packet_type = (packet or {}).get("type")
 
       if packet_type == "start":
@@ -570,8 +943,12 @@ async def handle_voice_ws(websocket: WebSocket):
           lang=(packet or {}).get("lang") or "zh",
           session_id=(packet or {}).get("session_id"),
           include_audio=bool((packet or {}).get("include_audio", True)),
+          binary_audio=bool((packet or {}).get("binary_audio", False)),
+          audio_format=str((packet or {}).get("audio_format") or "webm").lower(),
+          stream_tts=bool((packet or {}).get("stream_tts", False)),
         )
-        await websocket.send_json(
+        await _ws_send(
+          websocket,
           {
             "type": "ack",
             "session_id": state["session_id"],
@@ -589,29 +966,14 @@ async def handle_voice_ws(websocket: WebSocket):
         except Exception:
           continue
 
-        state["audio_buffer"].extend(chunk_bytes)
-
-        chunk_ms = int((packet or {}).get("duration_ms") or STREAM_DEFAULT_CHUNK_MS)
-        chunk_ms = max(10, min(chunk_ms, 1000))
-        state["total_audio_ms"] += chunk_ms
-
-        now_ms = time.monotonic() * 1000
-        energy = _normalize_energy((packet or {}).get("energy"))
-        if energy >= STREAM_STT_ENERGY_THRESHOLD:
-          state["voiced_ms"] += chunk_ms
-          state["last_voice_ts_ms"] = now_ms
-
-        await _schedule_partial_stt(state)
-        await _emit_partial_if_ready(websocket, state)
-
-        if state["total_audio_ms"] >= STREAM_STT_MAX_AUDIO_MS:
-          await _finalize_stream(websocket, state, final_reason="max_duration")
+        if await _handle_audio_chunk(
+          websocket,
+          state,
+          chunk_bytes,
+          (packet or {}).get("duration_ms"),
+          (packet or {}).get("energy"),
+        ):
           return
-
-        if _should_finalize_by_silence(state, now_ms):
-          await _finalize_stream(websocket, state, final_reason="silence_timeout")
-          return
-
         continue
 
       if packet_type == "stop":
@@ -619,10 +981,11 @@ async def handle_voice_ws(websocket: WebSocket):
         return
 
       if packet_type == "ping":
-        await websocket.send_json({"type": "pong"})
+        await _ws_send(websocket, {"type": "pong"})
         continue
 
-      await websocket.send_json(
+      await _ws_send(
+        websocket,
         {
           "type": "error",
           "message": "Unsupported message type",
@@ -633,12 +996,17 @@ async def handle_voice_ws(websocket: WebSocket):
     task = state.get("stt_task")
     if task and not task.done():
       task.cancel()
+    writer.cancel()
   except Exception as e:
     logger.exception("Voice websocket error: %s", e)
     try:
-      await websocket.send_json({"type": "error", "message": str(e)[:200]})
+      await _ws_send(websocket, {"type": "error", "message": str(e)[:200]})
     except Exception:
       pass
+  finally:
+    # Flush whatever is still queued before the handler returns and the socket closes
+    outbox.put_nowait(None)
+    await asyncio.gather(writer, return_exceptions=True)
 
 
 @app.post("/calendar/text", response_model=VoiceResponse)
@@ -715,8 +1083,26 @@ if __name__ == "__main__":
   port_retries = max(0, _int_env("BACKEND_PORT_RETRIES", 0))
   reload_enabled = os.getenv("BACKEND_RELOAD", "true").lower() in ("1", "true", "yes", "on")
 
+  # uvloop/httptools come with uvicorn[standard]; uvloop is unavailable on Windows
+  loop_impl = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+  http_impl = "httptools" if importlib.util.find_spec("httptools") else "h11"
+
   selected_port = _pick_port(host, preferred_port, port_retries)
-  print(f"Starting backend on {host}:{selected_port} (reload={reload_enabled})")
-  logger.info("Starting backend on %s:%s (reload=%s)", host, selected_port, reload_enabled)
-  uvicorn.run("main:app", host=host, port=selected_port, reload=reload_enabled)
+  print(f"Starting backend on {host}:{selected_port} (reload={reload_enabled}, loop={loop_impl}, http={http_impl})")
+  logger.info(
+    "Starting backend on %s:%s (reload=%s, loop=%s, http=%s)",
+    host,
+    selected_port,
+    reload_enabled,
+    loop_impl,
+    http_impl,
+  )
+  uvicorn.run(
+    "main:app",
+    host=host,
+    port=selected_port,
+    reload=reload_enabled,
+    loop=loop_impl,
+    http=http_impl,
+  )
 
@@ -1,7 +1,6 @@
 """MCP Server for Voice-Autopilot -- exposes connectors, extractors, and tools as MCP tools."""
 
 import asyncio
-import json
 import logging
 import os
 import sys
@@ -18,10 +17,11 @@ load_dotenv(BACKEND_DIR.parent / ".env")
 # faiss takes ~45s to load on first import; do it here before the event loop starts
 import faiss  # noqa: F401  (pre-warm so rag.retrieve doesn't block the event loop)
 from actions.dispatcher import execute_action
+from chat import _json
 from chat.autopilot_extractor import extract_autopilot_json, get_openai_client
 from chat.reply_drafter import generate_reply_draft
 from connectors import email_connector, linear, slack
-from rag.retrieve import retrieve
+from rag.retrieve import retrieve, warmup as warm_rag_index
 from store.runs import list_runs as _list_runs
 
 from mcp.server.fastmcp import FastMCP
@@ -34,11 +34,25 @@ logging.basicConfig(
 )
 logger = logging.getLogger("mcp_server")
 
+# Read the index and metadata now too, so the first search_knowledge_base call doesn't
+# block the event loop on disk I/O
+warm_rag_index()
+
 mcp = FastMCP(
     "voice-autopilot",
     instructions="Voice-Autopilot: meeting scheduling, Slack/email/Linear actions, knowledge base search",
 )
 
+# Tool arguments larger than this are parsed in a worker thread instead of on the event loop
+_INLINE_PARSE_MAX = 64 * 1024
+
+
+async def _parse_json(text: str):
+    if len(text) > _INLINE_PARSE_MAX:
+        return await asyncio.to_thread(_json.loads, text)
+    return _json.loads(text)
+
+
 # ────────────────────────── Tools ──────────────────────────
 
 
@@ -54,7 +68,7 @@ async def analyze_transcript(transcript: str, model: str | None = None) -> str:
         model: Optional OpenAI model override (defaults to env OPENAI_MODEL)
     """
     result = await extract_autopilot_json(transcript, model=model)
-    return json.dumps(result, ensure_ascii=False, indent=2)
+    return _json.dumps(result, indent=True)
 
 
 @mcp.tool()
@@ -73,11 +87,11 @@ async def search_knowledge_base(query: str, top_k: int = 5) -> str:
     try:
         results = await asyncio.wait_for(retrieve(query, client, top_k=top_k), timeout=30)
     except asyncio.TimeoutError:
-        return json.dumps({"error": "Knowledge base search timed out (30s). Check OPENAI_API_KEY and network."})
+        return _json.dumps({"error": "Knowledge base search timed out (30s). Check OPENAI_API_KEY and network."})
     except Exception as e:
         logger.exception("search_knowledge_base error")
-        return json.dumps({"error": f"Search failed: {str(e)[:300]}"})
-    return json.dumps(results, ensure_ascii=False, indent=2)
+        return _json.dumps({"error": f"Search failed: {str(e)[:300]}"})
+    return _json.dumps(results, indent=True)
 
 
 @mcp.tool()
@@ -89,7 +103,7 @@ async def send_slack_message(message: str, channel: str = "#general") -> str:
         channel: Slack channel name (default: #general)
     """
     result = await slack.execute({"message": message, "channel": channel})
-    return json.dumps(result, ensure_ascii=False)
+    return _json.dumps(result)
 
 
 @mcp.tool()
@@ -106,7 +120,7 @@ async def send_email(to: str, subject: str, body: str, body_html: str = "") -> s
     if body_html:
         payload["body_html"] = body_html
     result = await email_connector.execute(payload)
-    return json.dumps(result, ensure_ascii=False)
+    return _json.dumps(result)
 
 
 @mcp.tool()
@@ -127,7 +141,7 @@ async def create_linear_ticket(
         "description": description,
         "priority": priority,
     })
-    return json.dumps(result, ensure_ascii=False)
+    return _json.dumps(result)
 
 
 @mcp.tool()
@@ -160,7 +174,7 @@ async def create_calendar_event(
         },
     }
     result = await execute_action(action, lang=lang)
-    return json.dumps(result, ensure_ascii=False, default=str)
+    return _json.dumps(result, default=str)
 
 
 @mcp.tool()
@@ -179,10 +193,10 @@ async def draft_reply(
         evidence_json: JSON string of evidence chunks from search_knowledge_base (default: empty list)
     """
     client = get_openai_client()
-    extracted = json.loads(extracted_json)
-    evidence = json.loads(evidence_json)
-    result = await generate_reply_draft(client, transcript, extracted, evidence)
-    return json.dumps(result, ensure_ascii=False, indent=2)
+    await _parse_json(extracted_json)  # reject malformed input; the string itself goes into the prompt
+    evidence = await _parse_json(evidence_json)
+    result = await generate_reply_draft(client, transcript, extracted_json, evidence)
+    return _json.dumps(result, indent=True)
 
 
 @mcp.tool()
@@ -194,37 +208,83 @@ async def list_runs(limit: int = 20, run_type: str | None = None) -> str:
         run_type: Filter by type - "autopilot" or "voice_schedule" (default: all)
     """
     limit = min(max(limit, 1), 100)
-    runs = _list_runs(limit=limit, run_type=run_type)
-    return json.dumps(runs, ensure_ascii=False, indent=2, default=str)
+    runs = await asyncio.to_thread(_list_runs, limit=limit, run_type=run_type)
+    return _json.dumps(runs, indent=True, default=str)
 
 
 # ────────────────────────── Resources ──────────────────────────
 
+SCHEMA_PATH = BACKEND_DIR / "business" / "autopilot_schema.json"
+KB_DIR = BACKEND_DIR.parent / "knowledge_base"
 
-@mcp.resource("autopilot://schema")
-def get_autopilot_schema() -> str:
-    """The JSON schema used for extracting structured data from conversation transcripts."""
-    schema_path = BACKEND_DIR / "business" / "autopilot_schema.json"
-    return schema_path.read_text(encoding="utf-8")
+# (mtime, rendered body); a KB file added, removed or renamed bumps the directory mtime
+_schema_cache: tuple[float, str] | None = None
+_kb_listing_cache: tuple[float | None, str] | None = None
 
 
-@mcp.resource("autopilot://knowledge-base")
-def get_knowledge_base_listing() -> str:
-    """List of available knowledge base documents."""
-    kb_dir = BACKEND_DIR.parent / "knowledge_base"
-    if not kb_dir.exists():
-        return json.dumps({"documents": [], "message": "Knowledge base directory not found"})
+def _mtime(path: Path) -> float | None:
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def _scan_kb() -> str:
+    if not KB_DIR.exists():
+        return _json.dumps({"documents": [], "message": "Knowledge base directory not found"})
     docs = []
-    for md_file in sorted(kb_dir.glob("*.md")):
+    for md_file in sorted(KB_DIR.glob("*.md")):
         docs.append({
             "filename": md_file.name,
             "size_bytes": md_file.stat().st_size,
         })
-    return json.dumps({"documents": docs}, indent=2)
+    return _json.dumps({"documents": docs}, indent=True)
+
+
+@mcp.resource("autopilot://schema")
+async def get_autopilot_schema() -> str:
+    """The JSON schema used for extracting structured data from conversation transcripts."""
+    global _schema_cache
+    mtime = SCHEMA_PATH.stat().st_mtime
+    if _schema_cache is None or _schema_cache[0] != mtime:
+        _schema_cache = (mtime, await asyncio.to_thread(SCHEMA_PATH.read_text, encoding="utf-8"))
+    return _schema_cache[1]
+
+
+@mcp.resource("autopilot://knowledge-base")
+async def get_knowledge_base_listing() -> str:
+    """List of available knowledge base documents."""
+    global _kb_listing_cache
+    mtime = _mtime(KB_DIR)
+    if _kb_listing_cache is None or _kb_listing_cache[0] != mtime:
+        _kb_listing_cache = (mtime, await asyncio.to_thread(_scan_kb))
+    return _kb_listing_cache[1]
 
 
 # ────────────────────────── Entry point ──────────────────────────
 
 
 if __name__ == "__main__":
+    try:
+        import uvloop
+    except ImportError:  # optional (not available on Windows); default asyncio loop otherwise
+        uvloop = None
+    base_policy = uvloop.EventLoopPolicy if uvloop is not None else asyncio.DefaultEventLoopPolicy
+    eager_factory = getattr(asyncio, "eager_task_factory", None)  # Python 3.12+
+
+    class _ServerLoopPolicy(base_policy):
+        def new_event_loop(self):
+            loop = super().new_event_loop()
+            if eager_factory is not None:
+                # Tool coroutines that finish without suspending skip a scheduling round-trip
+                loop.set_task_factory(eager_factory)
+            return loop
+
+    # anyio builds its loop through the policy, so this covers the stdio read loop and every tool call
+    asyncio.set_event_loop_policy(_ServerLoopPolicy())
+    logger.info(
+        "Event loop: %s, eager tasks: %s",
+        "uvloop" if uvloop is not None else "asyncio",
+        eager_factory is not None,
+    )
     mcp.run(transport="stdio")
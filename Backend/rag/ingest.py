@@ -9,6 +9,8 @@ from pathlib import Path
 
 import numpy as np
 
+from rag.kb_meta import INDEX_FILE, new_generation, publish_generation, write_meta
+
 logger = logging.getLogger(__name__)
 
 KB_DIR = Path(__file__).resolve().parent.parent.parent / "knowledge_base"
@@ -17,6 +19,12 @@ EMBED_CACHE_PATH = STORE_DIR / "embed_cache.json"
 CHUNK_SIZE = 600  # target characters per chunk
 CHUNK_OVERLAP = 100
 
+# "auto" keeps exact search for small knowledge bases and switches to HNSW past RAG_HNSW_MIN_VECTORS
+RAG_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "auto").lower()  # auto | flat | sq8 | hnsw | ivfpq
+RAG_HNSW_MIN_VECTORS = int(os.getenv("RAG_HNSW_MIN_VECTORS", "10000"))
+RAG_HNSW_M = int(os.getenv("RAG_HNSW_M", "32"))
+RAG_HNSW_EF_CONSTRUCTION = int(os.getenv("RAG_HNSW_EF_CONSTRUCTION", "200"))
+
 
 def _ensure_dirs():
     STORE_DIR.mkdir(parents=True, exist_ok=True)
@@ -45,6 +53,36 @@ def _chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OV
     return chunks if chunks else [text.strip()]
 
 
+def _build_index(matrix: np.ndarray):
+    """Build the inner-product index for `matrix` (already L2-normalized)."""
+    import faiss
+
+    n, dim = matrix.shape
+    kind = RAG_INDEX_TYPE
+    if kind == "auto":
+        kind = "hnsw" if n >= RAG_HNSW_MIN_VECTORS else "flat"
+    # IVF-PQ needs ~39 training points per list; fall back to HNSW for corpora too small to train
+    if kind == "ivfpq" and n < 39 * 16:
+        kind = "hnsw"
+
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, RAG_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = RAG_HNSW_EF_CONSTRUCTION
+    elif kind == "ivfpq":
+        nlist = min(256, n // 39)
+        pq_m = next(m for m in (32, 16, 8, 4, 2, 1) if dim % m == 0)
+        index = faiss.index_factory(dim, f"IVF{nlist},PQ{pq_m}", faiss.METRIC_INNER_PRODUCT)
+        index.train(matrix)
+    elif kind == "sq8":
+        # Exhaustive search over int8 codes: a quarter of the float32 bytes scanned per query
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        index.train(matrix)
+    else:
+        index = faiss.IndexFlatIP(dim)
+    index.add(matrix)
+    return index
+
+
 def _text_hash(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
 
@@ -129,13 +167,15 @@ async def ingest_knowledge_base(client) -> dict:
 
     # Normalize for cosine similarity
     faiss.normalize_L2(matrix)
-    index = faiss.IndexFlatIP(dim)
-    index.add(matrix)
-
-    # Save index and metadata
-    faiss.write_index(index, str(STORE_DIR / "kb.index"))
-    with open(STORE_DIR / "kb_meta.json", "w", encoding="utf-8") as f:
-        json.dump(chunk_meta, f, ensure_ascii=False, indent=2)
+    index = _build_index(matrix)
+
+    # Save index and metadata into a new generation, so files a reader has mapped are never rewritten
+    gen_dir = new_generation(STORE_DIR)
+    index_tmp = gen_dir / f"{INDEX_FILE}.tmp"
+    faiss.write_index(index, str(index_tmp))
+    os.replace(index_tmp, gen_dir / INDEX_FILE)
+    write_meta(gen_dir, chunk_meta)
+    publish_generation(STORE_DIR, gen_dir)
 
     logger.info("FAISS index saved: dim=%d, vectors=%d", dim, index.ntotal)
     return {"documents": len(md_files), "chunks": len(all_chunks)}
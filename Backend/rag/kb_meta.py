@@ -0,0 +1,120 @@
+"""On-disk knowledge-base store: the FAISS index plus chunk metadata (one UTF-8 text blob and a
+fixed-width record per chunk), both memory-mapped on load.
+
+Each ingest writes into a fresh generation directory and then atomically repoints the CURRENT file at it,
+so files another process still has mapped are never rewritten (which Windows refuses and POSIX turns
+into SIGBUS or torn reads).
+"""
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+INDEX_FILE = "kb.index"
+TEXT_FILE = "kb_text.bin"
+RECORDS_FILE = "kb_meta.bin"
+DOCS_FILE = "kb_docs.json"
+LEGACY_FILE = "kb_meta.json"  # stores ingested before the binary layout
+POINTER_FILE = "CURRENT"
+GENERATION_PREFIX = "gen-"
+_KEEP_GENERATIONS = 2  # the live one plus its predecessor, which a reader may still be opening
+
+RECORD_DTYPE = np.dtype([("start", "<i8"), ("end", "<i8"), ("doc", "<i4"), ("chunk", "<i4")])
+
+
+class ChunkMeta:
+    """Column-wise chunk metadata: doc ids, chunk indexes and text spans as parallel arrays over one text blob."""
+
+    def __init__(self, records: np.ndarray, text: np.ndarray, docs: list[str]):
+        self._start = records["start"]
+        self._end = records["end"]
+        self._doc = records["doc"]
+        self._chunk = records["chunk"]
+        self._text = text
+        self._docs = docs
+
+    def __len__(self) -> int:
+        return len(self._chunk)
+
+    def __getitem__(self, idx: int) -> dict:
+        docs, chunks, texts = self.lookup([idx])
+        return {"doc": docs[0], "chunk_index": chunks[0], "text": texts[0]}
+
+    def lookup(self, ids: list[int]) -> tuple[list[str], list[int], list[str]]:
+        """Doc names, chunk indexes and texts for `ids`, gathered a column at a time."""
+        docs = [self._docs[d] for d in self._doc[ids].tolist()]
+        spans = zip(self._start[ids].tolist(), self._end[ids].tolist())
+        texts = [self._text[start:end].tobytes().decode("utf-8") for start, end in spans]
+        return docs, self._chunk[ids].tolist(), texts
+
+
+def _pack(chunk_meta: list[dict]) -> tuple[np.ndarray, bytes, list[str]]:
+    docs: dict[str, int] = {}
+    records = np.empty(len(chunk_meta), dtype=RECORD_DTYPE)
+    blob = bytearray()
+    for i, m in enumerate(chunk_meta):
+        encoded = m["text"].encode("utf-8")
+        records[i] = (len(blob), len(blob) + len(encoded), docs.setdefault(m["doc"], len(docs)), m["chunk_index"])
+        blob += encoded
+    return records, bytes(blob), list(docs)
+
+
+def new_generation(store_dir: Path) -> Path:
+    """Create an empty directory for the next ingest to write into."""
+    gen_dir = store_dir / f"{GENERATION_PREFIX}{time.time_ns()}"
+    gen_dir.mkdir(parents=True)
+    return gen_dir
+
+
+def publish_generation(store_dir: Path, gen_dir: Path) -> None:
+    """Atomically make `gen_dir` the live store, then drop generations no reader can still be opening."""
+    tmp = store_dir / f"{POINTER_FILE}.tmp"
+    tmp.write_text(gen_dir.name, encoding="utf-8")
+    os.replace(tmp, store_dir / POINTER_FILE)
+    generations = sorted(
+        (p for p in store_dir.glob(f"{GENERATION_PREFIX}*") if p.is_dir()),
+        key=lambda p: int(p.name[len(GENERATION_PREFIX):]),
+    )
+    for old in generations[:-_KEEP_GENERATIONS]:
+        # Windows won't delete files a running process still maps; the next ingest retries
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def current_dir(store_dir: Path) -> Path:
+    """Directory holding the live store: the generation CURRENT names, else `store_dir` (pre-generation stores)."""
+    try:
+        name = (store_dir / POINTER_FILE).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return store_dir
+    return store_dir / name
+
+
+def write_meta(gen_dir: Path, chunk_meta: list[dict]) -> None:
+    records, blob, docs = _pack(chunk_meta)
+    (gen_dir / TEXT_FILE).write_bytes(blob)
+    (gen_dir / DOCS_FILE).write_text(json.dumps(docs, ensure_ascii=False), encoding="utf-8")
+    (gen_dir / RECORDS_FILE).write_bytes(records.tobytes())
+
+
+def meta_path(data_dir: Path) -> Path:
+    """The file whose mtime tracks the metadata (binary records, else the legacy JSON)."""
+    path = data_dir / RECORDS_FILE
+    return path if path.exists() else data_dir / LEGACY_FILE
+
+
+def _map(path: Path, dtype) -> np.ndarray:
+    if path.stat().st_size == 0:  # np.memmap rejects empty files
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+def load_meta(data_dir: Path) -> ChunkMeta:
+    if not (data_dir / RECORDS_FILE).exists():
+        records, blob, docs = _pack(json.loads((data_dir / LEGACY_FILE).read_bytes()))
+        return ChunkMeta(records, np.frombuffer(blob, dtype=np.uint8), docs)
+    docs = json.loads((data_dir / DOCS_FILE).read_bytes())
+    return ChunkMeta(_map(data_dir / RECORDS_FILE, RECORD_DTYPE), _map(data_dir / TEXT_FILE, np.uint8), docs)
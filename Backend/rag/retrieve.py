@@ -1,25 +1,245 @@
 """Retrieve relevant chunks from the FAISS knowledge base."""
 
+import asyncio
+import base64
 import hashlib
-import json
 import logging
 import os
+from collections import OrderedDict
 from pathlib import Path
 
 import numpy as np
 
+from rag.kb_meta import INDEX_FILE, ChunkMeta, current_dir, load_meta, meta_path
+
 logger = logging.getLogger(__name__)
 
 STORE_DIR = Path(__file__).resolve().parent.parent / "rag_store"
-_retrieval_cache: dict[str, list[dict]] = {}
+# Search-time accuracy/speed knobs for approximate indexes (ignored by the flat index)
+RAG_HNSW_EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", "64"))
+RAG_IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "8"))
+# Memory-map the index file read-only so only touched pages are resident and processes share them
+RAG_INDEX_MMAP = os.getenv("RAG_INDEX_MMAP", "true").lower() in ("1", "true", "yes", "on")
+# Concurrent queries arriving within this window share one index.search call
+RAG_SEARCH_BATCH_MS = float(os.getenv("RAG_SEARCH_BATCH_MS", "2"))
+RAG_SEARCH_BATCH_MAX = int(os.getenv("RAG_SEARCH_BATCH_MAX", "32"))
+# OpenMP threads FAISS may use inside one search (it often defaults to 1 under a server)
+RAG_OMP_THREADS = int(os.getenv("RAG_OMP_THREADS", str(min(8, os.cpu_count() or 1))))
+# Move indexes of at least this many vectors to GPU 0 when faiss-gpu sees a device (0 disables)
+RAG_GPU_MIN_VECTORS = int(os.getenv("RAG_GPU_MIN_VECTORS", "50000"))
+# How often the background watcher re-stats the index files for an out-of-process re-ingest
+RAG_RELOAD_INTERVAL_S = float(os.getenv("RAG_RELOAD_INTERVAL_S", "30"))
+_RETRIEVAL_CACHE_MAX = 512
+_retrieval_cache: OrderedDict[str, list[dict]] = OrderedDict()
+_EMBED_CACHE_MAX = 1024
+_embed_cache: OrderedDict[str, np.ndarray] = OrderedDict()
 _faiss_index = None
-_faiss_meta: list[dict] | None = None
-_faiss_index_mtime: float | None = None
-_faiss_meta_mtime: float | None = None
+_faiss_meta: ChunkMeta | None = None
+# What the loaded store was read from: (store directory, index mtime, metadata mtime)
+_store_stamp: tuple | None = None
+_gpu_resources = None  # must outlive every GPU index built from it
+_watch_loop: asyncio.AbstractEventLoop | None = None
+_watch_task: asyncio.Task | None = None
+_search_queue: asyncio.Queue | None = None
+_search_loop: asyncio.AbstractEventLoop | None = None
+_search_task: asyncio.Task | None = None
 
 
 def _query_hash(query: str, top_k: int) -> str:
-    return hashlib.sha256(f"{query}::{top_k}".encode()).hexdigest()[:16]
+    # Cache key only, so no need for sha256; blake2b at 8 bytes gives the same 16 hex chars
+    return hashlib.blake2b(f"{query}::{top_k}".encode(), digest_size=8).hexdigest()
+
+
+async def _embed_query(query: str, client, model: str) -> np.ndarray:
+    """Normalized (1, d) query embedding, LRU-cached so a new top_k doesn't re-embed the same query."""
+    import faiss
+
+    key = hashlib.blake2b(f"{model}::{query}".encode(), digest_size=16).hexdigest()
+    cached = _embed_cache.get(key)
+    if cached is not None:
+        _embed_cache.move_to_end(key)
+        return cached
+
+    # base64 decodes straight into float32 instead of boxing d Python floats
+    resp = await client.embeddings.create(model=model, input=[query], encoding_format="base64")
+    q_vec = np.frombuffer(base64.b64decode(resp.data[0].embedding), dtype=np.float32).reshape(1, -1).copy()
+    faiss.normalize_L2(q_vec)
+    _embed_cache[key] = q_vec
+    if len(_embed_cache) > _EMBED_CACHE_MAX:
+        _embed_cache.popitem(last=False)
+    return q_vec
+
+
+def _read_index(index_path: Path):
+    import faiss
+
+    faiss.omp_set_num_threads(RAG_OMP_THREADS)
+    if RAG_INDEX_MMAP:
+        try:
+            return faiss.read_index(str(index_path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            logger.warning("Memory-mapped index load failed (%s); reading it into memory", e)
+    return faiss.read_index(str(index_path))
+
+
+def _store_stamp_now() -> tuple | None:
+    data_dir = current_dir(STORE_DIR)
+    try:
+        return str(data_dir), (data_dir / INDEX_FILE).stat().st_mtime, meta_path(data_dir).stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def _to_gpu(index):
+    """GPU copy of a large index, or the index unchanged (CPU build, no device, small or unsupported index)."""
+    global _gpu_resources
+    import faiss
+
+    if (
+        RAG_GPU_MIN_VECTORS <= 0
+        or index.ntotal < RAG_GPU_MIN_VECTORS
+        or not hasattr(faiss, "StandardGpuResources")
+        or faiss.get_num_gpus() == 0
+    ):
+        return index
+    try:
+        if _gpu_resources is None:
+            _gpu_resources = faiss.StandardGpuResources()
+        gpu_index = faiss.index_cpu_to_gpu(_gpu_resources, 0, index)
+    except RuntimeError as e:  # e.g. HNSW has no GPU implementation
+        logger.warning("Keeping FAISS index on CPU: %s", e)
+        return index
+    logger.info("FAISS index moved to GPU 0")
+    return gpu_index
+
+
+def _read_store():
+    """Read the index and metadata from disk (blocking); None when ingest hasn't run yet."""
+    stamp = _store_stamp_now()
+    if stamp is None:
+        return None
+    data_dir = Path(stamp[0])
+    index = _read_index(data_dir / INDEX_FILE)
+    _configure_search(index)  # before the GPU copy, which carries nprobe over
+    index = _to_gpu(index)
+    return index, load_meta(data_dir), stamp
+
+
+def _install_store(loaded) -> bool:
+    global _faiss_index, _faiss_meta, _store_stamp
+    if loaded is None:
+        return False
+    index, meta, stamp = loaded
+    _faiss_index, _faiss_meta = index, meta
+    _store_stamp = stamp
+    _retrieval_cache.clear()
+    logger.info("Loaded FAISS index with %d vectors", index.ntotal)
+    return True
+
+
+def _load_store() -> bool:
+    """(Re)load the index and metadata from disk; returns False when ingest hasn't run yet."""
+    return _install_store(_read_store())
+
+
+async def reload_store() -> bool:
+    """Re-read the store in a worker thread, then swap it in on the loop (also called after an in-process re-ingest)."""
+    return _install_store(await asyncio.to_thread(_read_store))
+
+
+def warmup() -> bool:
+    """Load the index at startup so the first query doesn't pay for it inside the event loop."""
+    try:
+        return _load_store()
+    except Exception as e:
+        logger.warning("FAISS index warmup failed: %s", e)
+        return False
+
+
+async def _watch_store() -> None:
+    while True:
+        await asyncio.sleep(RAG_RELOAD_INTERVAL_S)
+        stamp = await asyncio.to_thread(_store_stamp_now)
+        if stamp is None or stamp == _store_stamp:
+            continue
+        try:
+            await reload_store()
+        except Exception as e:  # keep serving the old store; the next tick retries
+            logger.warning("FAISS index reload failed: %s", e)
+
+
+def _ensure_watcher() -> None:
+    global _watch_loop, _watch_task
+    loop = asyncio.get_running_loop()
+    if _watch_loop is not loop:
+        _watch_loop = loop
+        _watch_task = loop.create_task(_watch_store())
+
+
+def _configure_search(index) -> None:
+    import faiss
+
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = RAG_HNSW_EF_SEARCH
+        return
+    try:
+        faiss.extract_index_ivf(index).nprobe = RAG_IVF_NPROBE
+    except RuntimeError:
+        pass  # flat index: nothing to tune
+
+
+def _search_batch(index, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """One index.search over every queued query for the same index; runs in a worker thread."""
+    if hasattr(index, "hnsw") and index.hnsw.efSearch < k * 4:
+        index.hnsw.efSearch = k * 4
+    return index.search(queries, k)
+
+
+async def _search_worker(queue: asyncio.Queue) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + RAG_SEARCH_BATCH_MS / 1000
+        while len(batch) < RAG_SEARCH_BATCH_MAX:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # A reload can swap the index mid-batch; search each index separately
+        by_index: dict[int, tuple] = {}
+        for index, q_vec, k, fut in batch:
+            by_index.setdefault(id(index), (index, []))[1].append((q_vec, k, fut))
+        for index, requests in by_index.values():
+            # FAISS releases the GIL, so the search (and its OpenMP threads) runs off the event loop
+            queries = np.vstack([q for q, _, _ in requests])
+            try:
+                scores, indices = await asyncio.to_thread(
+                    _search_batch, index, queries, max(k for _, k, _ in requests)
+                )
+            except Exception as e:
+                for _, _, fut in requests:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            for row, (_, k, fut) in enumerate(requests):
+                if not fut.done():
+                    fut.set_result((scores[row, :k], indices[row, :k]))
+
+
+async def _search(index, q_vec: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Queue a (1, d) query for the coalescing worker and wait for its (scores, ids) row."""
+    global _search_queue, _search_loop, _search_task
+    loop = asyncio.get_running_loop()
+    if _search_loop is not loop:
+        _search_queue = asyncio.Queue()
+        _search_loop = loop
+        _search_task = loop.create_task(_search_worker(_search_queue))
+    fut = loop.create_future()
+    _search_queue.put_nowait((index, q_vec, k, fut))
+    return await fut
 
 
 async def retrieve(
@@ -33,67 +253,43 @@ async def retrieve(
     Retrieve top-K chunks from the knowledge base.
     Returns list of {doc, chunk, score, text}.
     """
-    import faiss
+    _ensure_watcher()
+    if _faiss_index is None:
+        if not await reload_store():
+            logger.warning("FAISS index not found at %s. Run ingest first.", STORE_DIR)
+            return []
 
     cache_key = _query_hash(query, top_k)
-    if cache_key in _retrieval_cache:
+    cached = _retrieval_cache.get(cache_key)
+    if cached is not None:
+        _retrieval_cache.move_to_end(cache_key)
         logger.info("Retrieval cache hit for query hash %s", cache_key)
-        return _retrieval_cache[cache_key]
+        return cached
 
-    index_path = STORE_DIR / "kb.index"
-    meta_path = STORE_DIR / "kb_meta.json"
-
-    if not index_path.exists() or not meta_path.exists():
-        logger.warning("FAISS index not found at %s. Run ingest first.", STORE_DIR)
-        return []
+    index = _faiss_index
+    meta = _faiss_meta
 
     model = model or os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
 
-    # Embed query
-    resp = await client.embeddings.create(model=model, input=[query])
-    q_vec = np.array([resp.data[0].embedding], dtype="float32")
-    faiss.normalize_L2(q_vec)
-
-    # Load index and metadata with caching
-    global _faiss_index, _faiss_meta, _faiss_index_mtime, _faiss_meta_mtime
-    index_mtime = index_path.stat().st_mtime
-    meta_mtime = meta_path.stat().st_mtime
-    if (
-        _faiss_index is None
-        or _faiss_meta is None
-        or _faiss_index_mtime != index_mtime
-        or _faiss_meta_mtime != meta_mtime
-    ):
-        _faiss_index = faiss.read_index(str(index_path))
-        with open(meta_path, "r", encoding="utf-8") as f:
-            _faiss_meta = json.load(f)
-        _faiss_index_mtime = index_mtime
-        _faiss_meta_mtime = meta_mtime
-        _retrieval_cache.clear()
-
-    index = _faiss_index
-    meta = _faiss_meta
+    q_vec = await _embed_query(query, client, model)
 
     actual_k = min(top_k, index.ntotal)
     if actual_k == 0:
         return []
 
-    scores, indices = index.search(q_vec, actual_k)
+    scores, indices = await _search(index, q_vec, actual_k)
 
-    results = []
-    for rank in range(actual_k):
-        idx = int(indices[0][rank])
-        if idx < 0:
-            continue
-        score = float(scores[0][rank])
-        m = meta[idx]
-        results.append({
-            "doc": m["doc"],
-            "chunk": m["chunk_index"],
-            "score": round(score, 4),
-            "text": m["text"],
-        })
+    # FAISS pads missing hits with -1; drop them and gather each metadata column in one pass
+    hit = indices >= 0
+    docs, chunks, texts = meta.lookup(indices[hit].tolist())
+    rounded = scores[hit].round(4).tolist()
+    results = [
+        {"doc": doc, "chunk": chunk, "score": score, "text": text}
+        for doc, chunk, score, text in zip(docs, chunks, rounded, texts)
+    ]
 
     _retrieval_cache[cache_key] = results
+    if len(_retrieval_cache) > _RETRIEVAL_CACHE_MAX:
+        _retrieval_cache.popitem(last=False)
     logger.info("Retrieved %d chunks for query (len=%d)", len(results), len(query))
     return results
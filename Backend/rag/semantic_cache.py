@@ -0,0 +1,75 @@
+"""In-process semantic cache: transcript embedding -> previous pipeline output."""
+
+import copy
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes", "on")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "256"))
+SEMANTIC_CACHE_MIN_TOKENS = int(os.getenv("SEMANTIC_CACHE_MIN_TOKENS", "10"))
+
+# Row-aligned: _vectors[i] is the normalized embedding for _values[i] (oldest first)
+_vectors: np.ndarray | None = None
+_values: list[dict] = []
+
+
+def is_cacheable(text: str) -> bool:
+    """Short inputs collide too easily, so only cache transcripts of a reasonable length."""
+    if not SEMANTIC_CACHE_ENABLED or not text:
+        return False
+    # Whitespace words for Latin text, one token per CJK character
+    approx_tokens = len(text.split()) + sum(1 for ch in text if "\u4e00" <= ch <= "\u9fff")
+    return approx_tokens >= SEMANTIC_CACHE_MIN_TOKENS
+
+
+async def embed_text(text: str, client, *, model: str | None = None) -> np.ndarray:
+    """Embed a single text and return a normalized (d,) float32 vector."""
+    model = model or os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+    resp = await client.embeddings.create(model=model, input=[text])
+    return _normalize(resp.data[0].embedding)
+
+
+def lookup(embedding: np.ndarray) -> dict | None:
+    """Return a copy of the closest cached value if its cosine similarity clears the threshold."""
+    if _vectors is None or not _values:
+        return None
+    sims = _vectors @ embedding
+    best = int(np.argmax(sims))
+    score = float(sims[best])
+    if score < SEMANTIC_CACHE_THRESHOLD:
+        return None
+    logger.info("Semantic cache hit (similarity=%.4f)", score)
+    return copy.deepcopy(_values[best])
+
+
+def store(embedding: np.ndarray, value: dict) -> None:
+    """Add an entry, evicting the oldest ones beyond SEMANTIC_CACHE_MAX_ENTRIES."""
+    global _vectors, _values
+    row = embedding.reshape(1, -1)
+    if _vectors is None or _vectors.shape[1] != row.shape[1]:
+        _vectors = row.copy()
+        _values = [copy.deepcopy(value)]
+    else:
+        _vectors = np.vstack([_vectors, row])
+        _values.append(copy.deepcopy(value))
+    overflow = len(_values) - SEMANTIC_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        _vectors = _vectors[overflow:]
+        _values = _values[overflow:]
+
+
+def clear() -> None:
+    global _vectors, _values
+    _vectors = None
+    _values = []
+
+
+def _normalize(vec) -> np.ndarray:
+    arr = np.asarray(vec, dtype="float32")
+    norm = float(np.linalg.norm(arr))
+    return arr / norm if norm else arr
@@ -0,0 +1,73 @@
+"""Write-behind queue for run records, so request handlers don't wait on SQLite."""
+
+import asyncio
+import logging
+from collections import OrderedDict
+
+from store.runs import write_runs
+
+logger = logging.getLogger(__name__)
+
+_queue_loop: asyncio.AbstractEventLoop | None = None
+_queue: asyncio.Queue | None = None
+_writer: asyncio.Task | None = None
+# Runs with at least one write that never reached the database, reported by flush_runs()
+_LOST_MAX = 1024
+_lost: OrderedDict[str, None] = OrderedDict()
+
+
+def _ensure_writer() -> asyncio.Queue:
+    """The queue for the running loop; a new loop (reload worker, test client) gets its own queue and writer."""
+    global _queue_loop, _queue, _writer
+    loop = asyncio.get_running_loop()
+    if _queue_loop is not loop:
+        pending = []
+        while _queue is not None and not _queue.empty():
+            pending.append(_queue.get_nowait())  # left behind by a loop that has since stopped
+        _queue_loop, _queue, _writer = loop, asyncio.Queue(), None
+        for op in pending:
+            _queue.put_nowait(op)
+    if _writer is None or _writer.done():
+        _writer = loop.create_task(_write_loop(_queue))
+    return _queue
+
+
+def _record_lost(run_ids: list[str]) -> None:
+    for run_id in run_ids:
+        _lost[run_id] = None
+        _lost.move_to_end(run_id)
+    while len(_lost) > _LOST_MAX:
+        _lost.popitem(last=False)
+
+
+async def _write_loop(queue: asyncio.Queue) -> None:
+    while True:
+        batch = [await queue.get()]
+        while not queue.empty():
+            batch.append(queue.get_nowait())
+        try:
+            _record_lost(await asyncio.to_thread(write_runs, batch))
+        except Exception:
+            logger.exception("Failed to persist %d run write(s)", len(batch))
+            _record_lost([op[1] for op in batch])
+        finally:
+            for _ in batch:
+                queue.task_done()
+
+
+def queue_create_run(run_id: str, input_type: str, raw_input: str, run_type: str = "autopilot") -> None:
+    _ensure_writer().put_nowait(("create", run_id, input_type, raw_input, run_type))
+
+
+def queue_update_run(run_id: str, **fields) -> None:
+    _ensure_writer().put_nowait(("update", run_id, fields))
+
+
+async def flush_runs() -> frozenset[str]:
+    """
+    Wait until every queued write has been committed or dropped (call before reading runs back).
+    Returns the run_ids with dropped writes, whose stored rows may be stale or missing.
+    """
+    if _queue is not None:
+        await _ensure_writer().join()
+    return frozenset(_lost)
@@ -6,8 +6,32 @@ from datetime import datetime
 
 from store.db import get_connection
 
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used otherwise
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+_JSON_FIELDS = ("extracted_json", "evidence_json", "reply_draft", "actions_json")
+
+
+def _dumps(value) -> str:
+    """Serialize a JSON field for storage (non-ASCII kept, unknown types via str)."""
+    if orjson is not None:
+        return orjson.dumps(
+            value,
+            default=str,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        ).decode("utf-8")
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _loads(raw: str):
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
 
 def create_run(run_id: str, input_type: str, raw_input: str, run_type: str = "autopilot") -> None:
     conn = get_connection()
@@ -21,27 +45,74 @@ def create_run(run_id: str, input_type: str, raw_input: str, run_type: str = "au
         conn.close()
 
 
+def _update_sql(run_id: str, fields: dict) -> tuple[str, list]:
+    sets = []
+    vals = []
+    for k, v in fields.items():
+        if k in _JSON_FIELDS and not isinstance(v, str):
+            v = _dumps(v)
+        sets.append(f"{k} = ?")
+        vals.append(v)
+    sets.append("updated_at = ?")
+    vals.append(datetime.utcnow().isoformat())
+    vals.append(run_id)
+    return f"UPDATE runs SET {', '.join(sets)} WHERE run_id = ?", vals
+
+
 def update_run(run_id: str, **fields) -> None:
     """Update specific fields of a run. JSON-serializable values are auto-serialized."""
     conn = get_connection()
     try:
-        sets = []
-        vals = []
-        for k, v in fields.items():
-            if k in ("extracted_json", "evidence_json", "reply_draft", "actions_json") and not isinstance(v, str):
-                v = json.dumps(v, ensure_ascii=False, default=str)
-            sets.append(f"{k} = ?")
-            vals.append(v)
-        sets.append("updated_at = ?")
-        vals.append(datetime.utcnow().isoformat())
-        vals.append(run_id)
-        sql = f"UPDATE runs SET {', '.join(sets)} WHERE run_id = ?"
-        conn.execute(sql, vals)
+        conn.execute(*_update_sql(run_id, fields))
         conn.commit()
     finally:
         conn.close()
 
 
+def _apply_op(conn, op: tuple) -> None:
+    if op[0] == "create":
+        _, run_id, input_type, raw_input, run_type = op
+        conn.execute(
+            "INSERT OR IGNORE INTO runs (run_id, run_type, input_type, raw_input, status) VALUES (?, ?, ?, ?, 'pending')",
+            (run_id, run_type, input_type, raw_input[:10000]),
+        )
+    else:
+        _, run_id, fields = op
+        conn.execute(*_update_sql(run_id, fields))
+
+
+def write_runs(ops: list[tuple]) -> list[str]:
+    """
+    Apply ("create", run_id, input_type, raw_input, run_type) / ("update", run_id, fields) ops in one transaction.
+    If the batch fails, retry the ops one at a time so a bad op only drops itself.
+    Returns the run_ids whose ops could not be written.
+    """
+    conn = get_connection()
+    try:
+        try:
+            for op in ops:
+                _apply_op(conn, op)
+            conn.commit()
+            return []
+        except Exception:
+            conn.rollback()
+            if len(ops) == 1:
+                logger.exception("Dropped %s write for run %s", ops[0][0], ops[0][1])
+                return [ops[0][1]]
+        failed = []
+        for op in ops:
+            try:
+                _apply_op(conn, op)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                logger.exception("Dropped %s write for run %s", op[0], op[1])
+                failed.append(op[1])
+        return failed
+    finally:
+        conn.close()
+
+
 def get_run(run_id: str) -> dict | None:
     conn = get_connection()
     try:
@@ -50,11 +121,11 @@ def get_run(run_id: str) -> dict | None:
             return None
         d = dict(row)
         # Parse JSON fields
-        for jf in ("extracted_json", "evidence_json", "reply_draft", "actions_json"):
+        for jf in _JSON_FIELDS:
             if d.get(jf):
                 try:
-                    d[jf] = json.loads(d[jf])
-                except (json.JSONDecodeError, TypeError):
+                    d[jf] = _loads(d[jf])
+                except (ValueError, TypeError):
                     pass
         return d
     finally:
@@ -1,5 +1,6 @@
 """Minimal tests for the autopilot system."""
 
+import asyncio
 import json
 import sys
 from pathlib import Path
@@ -239,3 +240,282 @@ def test_sqlite_runs_crud():
     )
     run = get_run(run_id)
     assert run["extracted_json"]["intent"] == "support_issue"
+
+
+def test_run_queue_flushes_in_order():
+    """Queued run writes should land in order once flush_runs returns, on every event loop that uses the queue."""
+    import uuid
+    from store.run_queue import flush_runs, queue_create_run, queue_update_run
+    from store.runs import get_run
+
+    async def write_and_flush(run_id: str) -> None:
+        queue_create_run(run_id, "text", "Book a meeting", run_type="voice_schedule")
+        queue_update_run(run_id, status="extracted", extracted_json={"title": "Sync"})
+        queue_update_run(run_id, status="executed")
+        await flush_runs()
+
+    # Sequential loops, as with TestClient instances or a reloaded worker
+    for _ in range(2):
+        run_id = str(uuid.uuid4())
+        asyncio.run(write_and_flush(run_id))
+
+        run = get_run(run_id)
+        assert run["run_type"] == "voice_schedule"
+        assert run["extracted_json"] == {"title": "Sync"}
+        assert run["status"] == "executed"
+
+
+def test_run_queue_isolates_bad_write():
+    """One failing op should drop only itself and be reported by flush_runs."""
+    import uuid
+    from store.run_queue import flush_runs, queue_create_run, queue_update_run
+    from store.runs import get_run
+
+    good, bad = str(uuid.uuid4()), str(uuid.uuid4())
+
+    async def write_and_flush() -> frozenset[str]:
+        queue_create_run(good, "text", "Book a meeting")
+        queue_create_run(bad, "text", "Book another")
+        queue_update_run(bad, no_such_column="x")
+        queue_update_run(good, status="executed")
+        return await flush_runs()
+
+    lost = asyncio.run(write_and_flush())
+
+    assert bad in lost and good not in lost
+    assert get_run(good)["status"] == "executed"
+    assert get_run(bad)["status"] == "pending"
+
+
+# --- Test: Email rendering helpers ---
+
+def test_starts_with_greeting():
+    """Greeting detection should be case-insensitive for English and exact for Chinese."""
+    from api.autopilot import _starts_with_greeting
+
+    assert _starts_with_greeting("  Hello Jack, thanks for reaching out.", "en")
+    assert _starts_with_greeting("DEAR team", "en")
+    assert not _starts_with_greeting("Thanks for reaching out.", "en")
+    assert _starts_with_greeting("您好，感谢来信。", "zh")
+    assert not _starts_with_greeting("感谢来信。", "zh")
+    assert not _starts_with_greeting("   ", "en")
+
+
+def test_text_to_html():
+    """Paragraphs become <p> blocks, single newlines <br/>, and content is escaped."""
+    from api.autopilot import _text_to_html
+
+    assert _text_to_html("") == ""
+    assert _text_to_html("a < b\nc\n\nd & e") == "<p>a &lt; b<br/>c</p>\n<p>d &amp; e</p>"
+
+
+def test_build_email_content_escapes_contact():
+    """Email HTML should escape the contact name while plain text keeps it verbatim."""
+    from api.autopilot import _build_email_content
+
+    extracted = {
+        "conversation_language": "en",
+        "summary": "Demo request",
+        "entities": {"email": "jack@example.com", "contact_name": "Jack <CTO>"},
+    }
+    content = _build_email_content({"reply_text": "Thanks for reaching out."}, extracted)
+    assert content["body_text"].startswith("Hi Jack <CTO>,")
+    assert "<p>Hi Jack &lt;CTO&gt;,</p>" in content["body_html"]
+    assert "<p><strong>Voice Autopilot (noreply)</strong></p>" in content["body_html"]
+    assert content["subject"] == "Re: Demo request"
+
+
+def test_resolve_time_formats():
+    """Times in 24h/12h variants should normalize to HH:MM; unknown values pass through."""
+    from api.autopilot import _resolve_time
+
+    assert _resolve_time("") == ""
+    assert _resolve_time("14:30") == "14:30"
+    assert _resolve_time("9:05") == "09:05"
+    assert _resolve_time("14:30:00") == "14:30"
+    assert _resolve_time("2:30 PM") == "14:30"
+    assert _resolve_time("12am") == "00:00"
+    assert _resolve_time("12 pm") == "12:00"
+    assert _resolve_time("10") == "10"
+    assert _resolve_time("25:00") == "25:00"
+    assert _resolve_time("13pm") == "13pm"
+    assert _resolve_time("afternoon") == "afternoon"
+
+
+def test_calendar_normalise_time():
+    """Calendar extractor times should normalize to zero-padded HH:MM."""
+    from chat.calendar_extractor import _normalise_time
+
+    assert _normalise_time("9:05") == "09:05"
+    assert _normalise_time("14:30:00") == "14:30"
+    assert _normalise_time(" 3 PM ") == "15:00"
+    assert _normalise_time("12am") == "00:00"
+    assert _normalise_time("noon") == "noon"
+
+
+@pytest.mark.parametrize(
+    "label, hours",
+    [
+        ("10am to 11am, 测试：和 CEO 会议, Jayden Liu, ...", (10, 0, 11, 0)),
+        ("10:00 – 11:30", (10, 0, 11, 30)),
+        ("下午10点 - 下午11点，111111，Jayden Liu，没有地点信息，2025年11月28日", (22, 0, 23, 0)),
+        ("下午10:00 - 下午11:30，...", (22, 0, 23, 30)),
+        ("上午9点30分至10点，周会", (9, 30, 10, 0)),
+        ("11:30am - 1pm, Lunch", (11, 30, 13, 0)),
+        # Mixed formats: the leftmost time range in the label wins
+        ("10am to 11am, 下午3点-4点 复盘", (10, 0, 11, 0)),
+        ("下午3点-4点 复盘, 10am to 11am", (15, 0, 16, 0)),
+        ("All day, no time", None),
+    ],
+)
+def test_calendar_label_time_parsing(label, hours):
+    """Calendar event labels should yield 24h start/end hours for conflict detection."""
+    from datetime import datetime
+    from tools.label_time import parse_event_time_from_label, parse_label_hours
+
+    assert parse_label_hours(label) == hours
+    parsed = parse_event_time_from_label(label, datetime(2025, 11, 28))
+    if hours is None:
+        assert parsed is None
+    else:
+        assert (parsed[0].hour, parsed[0].minute, parsed[1].hour, parsed[1].minute) == hours
+
+
+def test_calendar_command_parses_unpadded_date():
+    """An unpadded date passed through by _normalise_date must still build a calendar command."""
+    from datetime import date, datetime, time
+
+    from chat.calendar_extractor import _normalise_date, _normalise_time
+    from utils.datetime_fmt import fast_date, fast_hm
+
+    extracted_date = _normalise_date("2026-2-6", datetime(2026, 1, 1))
+    assert extracted_date == "2026-2-6"
+    assert fast_date(extracted_date) == date(2026, 2, 6)
+    assert fast_date("2026-02-06") == date(2026, 2, 6)
+    assert fast_hm(_normalise_time("3 PM")) == time(15, 0)
+    assert fast_hm("9:05") == time(9, 5)
+
+
+def test_resolve_date_relative():
+    """Dates should resolve against the reference time in either language; unknown values pass through."""
+    from datetime import datetime
+    from api.autopilot import _resolve_date
+
+    ref = datetime(2025, 1, 15, 9, 30)
+    assert _resolve_date("", ref) == "2025-01-15"
+    assert _resolve_date("2025-02-01", ref) == "2025-02-01"
+    assert _resolve_date("tomorrow", ref) == "2025-01-16"
+    assert _resolve_date("明天", ref, "zh") == "2025-01-16"
+    assert _resolve_date("not a date", ref) == "not a date"
+
+
+def test_reply_text_stream_decodes_partial_json():
+    """Streamed reply_text should decode incrementally, including escapes split across chunks."""
+    from chat.reply_drafter import _ReplyTextStream
+
+    raw = json.dumps({"reply_text": 'Hi "Bob",\nthanks \U0001F600 你好', "citations": ["faq.md#0"]})
+    stream = _ReplyTextStream()
+    text = "".join(stream.feed(raw[:i]) for i in range(len(raw) + 1))
+    assert text == json.loads(raw)["reply_text"]
+
+
+def test_reply_text_stream_tolerates_raw_newline_and_split_unicode_escape():
+    """A literal newline or a \\u escape split mid-sequence must not abort the stream."""
+    from chat.reply_drafter import _ReplyTextStream
+
+    stream = _ReplyTextStream()
+    buffer = ""
+    pieces = []
+    for delta in ('{"reply_text": "line one', "\nline two ", "caf\\u00", "e9 done", '", "citations": []}'):
+        buffer += delta
+        pieces.append(stream.feed(buffer))
+    assert "".join(pieces) == "line one\nline two café done"
+
+
+# --- Test: Action enrichment ---
+
+@pytest.mark.asyncio
+async def test_enrich_actions_fills_payloads():
+    """Enrichment should fill defaults per action type and drop email actions without a recipient."""
+    from api.autopilot import _enrich_actions
+
+    extracted = {
+        "summary": "Acme wants a demo",
+        "urgency": "high",
+        "conversation_language": "en",
+        "entities": {},
+    }
+    actions = [
+        {"action_type": "create_ticket", "payload": {}},
+        {"action_type": "send_email_followup", "payload": {}},
+        {"action_type": "none", "payload": {"note": "keep"}},
+        {"action_type": "create_ticket", "payload": {"title": "T", "description": "D", "priority": "low"}},
+    ]
+    result = await _enrich_actions(actions, extracted, {})
+    by_type = {a["action_type"]: a for a in result}
+
+    assert "send_email_followup" not in by_type
+    assert result[0]["payload"]["priority"] == "high"
+    assert result[0]["payload"]["title"] == "Acme wants a demo"
+    assert by_type["none"]["payload"] == {"note": "keep"}
+    slack = by_type["send_slack_summary"]["payload"]
+    assert slack["channel"] == "#general"
+    assert "Summary: Acme wants a demo" in slack["message"]
+    assert actions[0]["payload"] == {}  # inputs are not mutated
+    assert result[2] is actions[3]  # complete payloads are passed through without copying
+
+
+# --- Test: Semantic cache ---
+
+def test_semantic_cache_lookup_and_eviction(monkeypatch):
+    """Semantic cache should hit on similar vectors, miss on dissimilar ones, and stay bounded."""
+    from rag import semantic_cache
+
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE_MAX_ENTRIES", 2)
+    semantic_cache.clear()
+
+    a = semantic_cache._normalize([1.0, 0.0, 0.0])
+    b = semantic_cache._normalize([0.0, 1.0, 0.0])
+    c = semantic_cache._normalize([0.0, 0.0, 1.0])
+
+    semantic_cache.store(a, {"draft": "a"})
+    hit = semantic_cache.lookup(semantic_cache._normalize([0.99, 0.05, 0.0]))
+    assert hit == {"draft": "a"}
+    assert semantic_cache.lookup(b) is None
+
+    semantic_cache.store(b, {"draft": "b"})
+    semantic_cache.store(c, {"draft": "c"})
+    assert semantic_cache.lookup(a) is None  # evicted as oldest
+    assert semantic_cache.lookup(c) == {"draft": "c"}
+    semantic_cache.clear()
+
+
+# --- Test: Versioned RAG metadata store ---
+
+def test_kb_meta_reingest_while_mapped(tmp_path):
+    """Re-ingesting must not rewrite files a loaded store still maps, and old generations get pruned."""
+    from rag import kb_meta
+
+    def ingest(texts):
+        gen_dir = kb_meta.new_generation(tmp_path)
+        kb_meta.write_meta(gen_dir, [{"doc": "a.md", "chunk_index": i, "text": t} for i, t in enumerate(texts)])
+        kb_meta.publish_generation(tmp_path, gen_dir)
+        return gen_dir
+
+    first = ingest(["alpha", "béta"])
+    loaded = kb_meta.load_meta(kb_meta.current_dir(tmp_path))
+    first_bytes = (first / kb_meta.TEXT_FILE).read_bytes()
+
+    second = ingest(["gamma 你好"])
+    assert second != first
+    assert kb_meta.current_dir(tmp_path) == second
+    # The mapped first generation is untouched and still readable
+    assert (first / kb_meta.TEXT_FILE).read_bytes() == first_bytes
+    assert loaded.lookup([1, 0]) == (["a.md", "a.md"], [1, 0], ["béta", "alpha"])
+
+    reloaded = kb_meta.load_meta(kb_meta.current_dir(tmp_path))
+    assert len(reloaded) == 1 and reloaded[0]["text"] == "gamma 你好"
+
+    third = ingest(["delta"])
+    generations = sorted(p.name for p in tmp_path.glob(f"{kb_meta.GENERATION_PREFIX}*"))
+    assert generations == sorted([second.name, third.name])
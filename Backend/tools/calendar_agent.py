@@ -2,6 +2,7 @@ import logging
 import re
 import sys
 import time as _time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date as Date, time as Time, datetime, timedelta
 from pathlib import Path
 from typing import Optional, Tuple
@@ -10,11 +11,13 @@ from urllib.parse import urlparse  # 正确判断域名
 from playwright.sync_api import (
   sync_playwright,
   BrowserContext,
+  Locator,
   Page,
   TimeoutError as PlaywrightTimeoutError,
   Error as PlaywrightError,
 )
 
+from .label_time import parse_event_time_from_label
 from .models import CalendarCommand, CalendarResult
 
 TOOLS_DIR = Path(__file__).resolve().parent
@@ -22,8 +25,15 @@ CHROME_PATH = TOOLS_DIR / "chrome-win" / "chrome.exe"
 
 LOGIN_URL = "https://calendar.google.com/"
 DAY_VIEW_BASE = "https://calendar.google.com/calendar/u/0/r/day"
+# 日视图可用：出现事件块或带 aria-label 的网格
+DAY_VIEW_READY_SELECTOR = 'div[role="button"][data-eventchip], [role="grid"][aria-label]'
 
 CHROME_PROFILE_DIR = TOOLS_DIR.parent / "chrome_profile"
+# 浏览器跨请求复用，省去每次冷启动 Chrome。Playwright sync 对象只能在创建它的线程里使用，
+# 且持久化 Profile 同一时间只能被一个 Chrome 实例打开：所有浏览器操作都在这一个专用线程上串行执行
+_BROWSER_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="calendar-browser")
+_playwright = None
+_context: Optional[BrowserContext] = None
 
 logger = logging.getLogger(__name__)
 
@@ -44,115 +54,73 @@ def _overlap(
 ) -> bool:
   return max(start1, start2) < min(end1, end2)
 
-def _parse_event_time_from_label(
-  label: str, event_date: datetime
-) -> Optional[Tuple[datetime, datetime]]:
-  """
-    英文：
-    - "10am to 11am, 测试：和 CEO 会议, Jayden Liu, ..."
-    - "10:00 – 11:30"
-    中文：
-    - "下午10点 - 下午11点，111111，Jayden Liu，没有地点信息，2025年11月28日"
-    - "下午10:00 - 下午11:30，..."
-  """
-  text_raw = label.strip()
-  text = text_raw.lower()
-
-  zh = re.search(
-    r'(上午|下午)\s*' # period1: 上午/下午
-    r'(\d{1,2})' # h1
-    r'(?:[:：](\d{1,2}))?' # :mm，可选
-    r'(?:点)?'
-    r'(?:\s*(\d{1,2})分)?' # 兼容 “10点30分”
-    r'\s*[-–－—~～至到 ]+\s*' # 连接符：-、–、至、到 等
-    r'(上午|下午)?\s*' # period2：省略则复用前一个
-    r'(\d{1,2})' # h2
-    r'(?:[:：](\d{1,2}))?'
-    r'(?:点)?'
-    r'(?:\s*(\d{1,2})分)?',
-    text_raw,
-  )
-  if zh:
-    period1, h1, m1_colon, m1_fen, period2, h2, m2_colon, m2_fen = zh.groups()
-
-    def zh_to_24h(period: str, h: str,
-            m_colon: Optional[str],
-            m_fen: Optional[str]) -> Tuple[int, int]:
-      hour = int(h)
-      if m_colon is not None:
-        minute = int(m_colon)
-      elif m_fen is not None:
-        minute = int(m_fen)
-      else:
-        minute = 0
-
-      if period == "上午":
-        if hour == 12:
-          hour = 0
-      elif period == "下午":
-        if hour < 12:
-          hour += 12
-      return hour, minute
-
-    if period2 is None:
-      period2 = period1
-
-    sh, sm = zh_to_24h(period1, h1, m1_colon, m1_fen)
-    eh, em = zh_to_24h(period2, h2, m2_colon, m2_fen)
-
-    start = event_date.replace(hour=sh, minute=sm, second=0, microsecond=0)
-    end = event_date.replace(hour=eh, minute=em, second=0, microsecond=0)
-    return start, end
-
-  # 10am to 11am
-  m = re.search(
-    r'(\d{1,2})(?::(\d{2}))?\s*(am|pm)\s*(?:to|–|-|—)\s*'
-    r'(\d{1,2})(?::(\d{2}))?\s*(am|pm)?',
-    text,
-  )
-  if m:
-    h1, m1, ap1, h2, m2, ap2 = m.groups()
-
-    def to_24h(h: str, m: Optional[str], ap: str) -> Tuple[int, int]:
-      hour = int(h)
-      minute = int(m) if m else 0
-      if ap == "pm" and hour < 12:
-        hour += 12
-      if ap == "am" and hour == 12:
-        hour = 0
-      return hour, minute
-
-    if ap2 is None:
-      ap2 = ap1
-
-    sh, sm = to_24h(h1, m1, ap1)
-    eh, em = to_24h(h2, m2, ap2)
-
-    start = event_date.replace(hour=sh, minute=sm, second=0, microsecond=0)
-    end = event_date.replace(hour=eh, minute=em, second=0, microsecond=0)
-    return start, end
-
-  # 10:00 – 11:30
-  m = re.search(r'(\d{1,2}:\d{2})\s*[–\-－—]\s*(\d{1,2}:\d{2})', text)
-  if m:
-    start_str, end_str = m.group(1), m.group(2)
-
-    def to_dt(time_str: str) -> datetime:
-      h, m = time_str.split(":")
-      return event_date.replace(
-        hour=int(h), minute=int(m), second=0, microsecond=0
-      )
-
-    start = to_dt(start_str)
-    end = to_dt(end_str)
-    return start, end
+_CREATE_BUTTON_RE = re.compile(r"(Create|创建|新建)", re.IGNORECASE)
+# 创建事件弹窗里的输入框：中英文 aria-label 合成一个选择器，一次查询
+_START_DATE_INPUT = 'input[aria-label="Start date"], input[aria-label="开始日期"]'
+_END_DATE_INPUT = 'input[aria-label="End date"], input[aria-label="结束日期"]'
+_START_TIME_INPUT = 'input[aria-label="Start time"], input[aria-label="开始时间"]'
+_END_TIME_INPUT = 'input[aria-label="End time"], input[aria-label="结束时间"]'
+_SAVE_BUTTON_RE = re.compile(r"^(Save|保存)$")
+_SAVE_TEXT_RE = re.compile(r"Save|保存", re.IGNORECASE)
+# 一次 evaluate 取回所有事件 label（优先 .XuJrye，否则整个按钮文本），避免每个事件两次 CDP 往返
+_EVENT_LABELS_JS = """() => Array.from(
+  document.querySelectorAll('div[role="button"][data-eventchip]'),
+  (btn) => {
+    const info = btn.querySelector('.XuJrye');
+    return (info ? info.innerText : btn.innerText).trim();
+  },
+).filter(Boolean)"""
+
+# 自动化用不到的资源：图片（头像）、字体和统计脚本。
+# 用 CDP 在网络层屏蔽而不是 context.route：route 会关掉 HTTP 缓存并让每个请求都绕一圈 Python，
+# Calendar 的大体积脚本每次都要重新下载，得不偿失。
+# 登录页验证码图片走 accounts.google.com 且不带扩展名，不会被这些规则命中。
+_BLOCKED_URL_PATTERNS = [
+  "*googletagmanager.com*",
+  "*google-analytics.com*",
+  "*://lh*.googleusercontent.com/*",
+  "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp",
+  "*.woff", "*.woff2", "*.ttf",
+]
+
+def _block_heavy_resources(page: Page) -> None:
+  try:
+    cdp = page.context.new_cdp_session(page)
+    cdp.send("Network.enable")
+    cdp.send("Network.setBlockedURLs", {"urls": _BLOCKED_URL_PATTERNS})
+  except Exception as e:  # 只是优化，失败就照常加载
+    logger.debug("Could not block heavy resources: %s", e)
+
+def _forget_context(_context_closed: BrowserContext) -> None:
+  # 用户手动关掉了窗口或浏览器崩溃：下次请求重新启动
+  global _context
+  _context = None
+
+def _shutdown_browser() -> None:
+  global _playwright, _context
+  if _context is not None:
+    try:
+      _context.close()
+    except Exception:
+      pass
+  if _playwright is not None:
+    try:
+      _playwright.stop()
+    except Exception:
+      pass
+  _playwright = None
+  _context = None
 
-  return None
+def close_browser() -> None:
+  """关闭复用的浏览器（进程退出前调用）。"""
+  _BROWSER_EXECUTOR.submit(_shutdown_browser).result()
 
 class GoogleCalendarAgent:
   # 持久化 Chrome Profile 操作 Google Calendar
   GOTO_TIMEOUT_MS = 20_000  # 20秒
-  SMALL_WAIT_MS = 2_000
+  DAY_VIEW_READY_TIMEOUT_MS = 15_000
+  FIELD_WAIT_MS = 2_000
+  SAVE_CLICK_TIMEOUT_MS = 5_000
 
   def __init__(self, lang: str = "zh"):
     self.lang = _normalize_lang(lang)
@@ -204,65 +172,76 @@ class GoogleCalendarAgent:
       cmd.title,
     )
 
-    try:
-      with sync_playwright() as p:
-        # 确保已进入 Calendar 主界面
-        context, op_page = self._create_or_load_context(p)
+    return _BROWSER_EXECUTOR.submit(self._check_and_create_in_browser, cmd).result()
 
-        try:
-          # 打开指定日期
-          self._open_day_view(op_page, cmd)
+  def close(self) -> None:
+    close_browser()
 
-          # 冲突检测
-          if self._detect_conflict(op_page, cmd):
-            msg = (
-              _t(
-                self.lang,
-                f"您在 {cmd.date.strftime('%Y-%m-%d')} "
-                f"{cmd.start_time.strftime('%H:%M')} 到 {cmd.end_time.strftime('%H:%M')} "
-                f"已经有日程安排了，请换一个时间。",
-                f"You already have an event on {cmd.date.strftime('%Y-%m-%d')} "
-                f"from {cmd.start_time.strftime('%H:%M')} to {cmd.end_time.strftime('%H:%M')}. "
-                f"Please choose another time.",
-              )
-            )
-            logger.info(_t(self.lang, "检测到日程冲突", "Schedule conflict detected"))
-            return CalendarResult(
-              success=False,
-              conflict=True,
-              message=msg,
-            )
+  def __enter__(self) -> "GoogleCalendarAgent":
+    return self
+
+  def __exit__(self, *exc) -> None:
+    self.close()
 
-          # 无冲突：创建事件
-          if getattr(cmd, "end_date", None) and cmd.end_date > cmd.date:
-            # undo
-            self._create_multi_day_event(op_page, cmd)
-          else:
-            self._create_event(op_page, cmd)
+  def _check_and_create_in_browser(self, cmd: CalendarCommand) -> CalendarResult:
+    # 只在 _BROWSER_EXECUTOR 线程上运行
+    try:
+      # 复用已启动的浏览器，每个请求一个新 Tab
+      op_page = self._get_context().new_page()
+      try:
+        # 打开指定日期
+        self._open_day_view(op_page, cmd)
 
+        # 冲突检测
+        if self._detect_conflict(op_page, cmd):
           msg = (
             _t(
               self.lang,
-              f"好的，已经帮你在 {cmd.date.strftime('%Y-%m-%d')} "
+              f"您在 {cmd.date.strftime('%Y-%m-%d')} "
               f"{cmd.start_time.strftime('%H:%M')} 到 {cmd.end_time.strftime('%H:%M')} "
-              f"创建了日程「{cmd.title}」。",
-              f"Done. Created an event on {cmd.date.strftime('%Y-%m-%d')} "
-              f"from {cmd.start_time.strftime('%H:%M')} to {cmd.end_time.strftime('%H:%M')}: "
-              f"\"{cmd.title}\".",
+              f"已经有日程安排了，请换一个时间。",
+              f"You already have an event on {cmd.date.strftime('%Y-%m-%d')} "
+              f"from {cmd.start_time.strftime('%H:%M')} to {cmd.end_time.strftime('%H:%M')}. "
+              f"Please choose another time.",
             )
           )
-          logger.info(_t(self.lang, "日程创建成功", "Schedule created successfully"))
+          logger.info(_t(self.lang, "检测到日程冲突", "Schedule conflict detected"))
           return CalendarResult(
-            success=True,
-            conflict=False,
+            success=False,
+            conflict=True,
             message=msg,
           )
 
-        finally:
-          try:
-            context.close()
-          except Exception:
-            pass
+        # 无冲突：创建事件
+        if getattr(cmd, "end_date", None) and cmd.end_date > cmd.date:
+          # undo
+          self._create_multi_day_event(op_page, cmd)
+        else:
+          self._create_event(op_page, cmd)
+
+        msg = (
+          _t(
+            self.lang,
+            f"好的，已经帮你在 {cmd.date.strftime('%Y-%m-%d')} "
+            f"{cmd.start_time.strftime('%H:%M')} 到 {cmd.end_time.strftime('%H:%M')} "
+            f"创建了日程「{cmd.title}」。",
+            f"Done. Created an event on {cmd.date.strftime('%Y-%m-%d')} "
+            f"from {cmd.start_time.strftime('%H:%M')} to {cmd.end_time.strftime('%H:%M')}: "
+            f"\"{cmd.title}\".",
+          )
+        )
+        logger.info(_t(self.lang, "日程创建成功", "Schedule created successfully"))
+        return CalendarResult(
+          success=True,
+          conflict=False,
+          message=msg,
+        )
+
+      finally:
+        try:
+          op_page.close()
+        except Exception:
+          pass
 
     except PlaywrightTimeoutError:
       logger.exception(_t(self.lang, "访问 Google 日历超时", "Timed out accessing Google Calendar"))
@@ -298,7 +277,17 @@ class GoogleCalendarAgent:
         ),
       )
 
-  def _create_or_load_context(self, pw) -> tuple[BrowserContext, Page]:
+  def _get_context(self) -> BrowserContext:
+    global _playwright, _context
+    if _context is None:
+      if _playwright is None:
+        _playwright = sync_playwright().start()
+      context = self._create_or_load_context(_playwright)
+      context.on("close", _forget_context)
+      _context = context
+    return _context
+
+  def _create_or_load_context(self, pw) -> BrowserContext:
     # 使用持久化用户数据目录
     context: BrowserContext = pw.chromium.launch_persistent_context(
       user_data_dir=str(CHROME_PROFILE_DIR),
@@ -311,11 +300,16 @@ class GoogleCalendarAgent:
         "--disable-blink-features=AutomationControlled",
       ],
     )
-    # 免误刷新登录页
-    self._ensure_logged_in(context)
-    # 新 Tab
-    op_page = context.new_page()
-    return context, op_page
+    for page in context.pages:
+      _block_heavy_resources(page)
+    context.on("page", _block_heavy_resources)
+    # 免误刷新登录页；登录失败时关掉，否则 Profile 一直被占用，下次无法启动
+    try:
+      self._ensure_logged_in(context)
+    except Exception:
+      context.close()
+      raise
+    return context
 
   def _ensure_logged_in(self, context: BrowserContext) -> None:
     # 确保进入 Calendar 主界面
@@ -346,13 +340,13 @@ class GoogleCalendarAgent:
       # 只发起导航，不再强制等 load_state
       try:
         # 用较短超时时间
-        entry_page.goto(LOGIN_URL, wait_until="domcontentloaded", timeout=15_000)
+        entry_page.goto(LOGIN_URL, wait_until="commit", timeout=15_000)
       except PlaywrightTimeoutError:
         logger.warning(
           _t(
             self.lang,
-            "打开 Google Calendar 入口页面 DOMContentLoaded 超时，继续等待登录状态变化。",
-            "DOMContentLoaded timed out when opening Google Calendar entry page; waiting for login state.",
+            "打开 Google Calendar 入口页面超时，继续等待登录状态变化。",
+            "Timed out opening Google Calendar entry page; waiting for login state.",
           )
         )
     else:
@@ -433,7 +427,7 @@ class GoogleCalendarAgent:
       # 新建按钮
       create_btn = page.get_by_role(
         "button",
-        name=re.compile(r"(Create|创建|新建)", re.IGNORECASE),
+        name=_CREATE_BUTTON_RE,
       )
       if create_btn.count() > 0:
         return True
@@ -447,57 +441,41 @@ class GoogleCalendarAgent:
     # 跳转到指定日期的日视图
     url = f"{DAY_VIEW_BASE}/{cmd.date.year}/{cmd.date.month}/{cmd.date.day}"
     logger.info(_t(self.lang, "打开日视图：%s", "Opening day view: %s"), url)
+    # Calendar 一直保持长轮询，networkidle 基本等不到；只等导航提交，再等日视图本身渲染出来
     try:
-      page.goto(url, wait_until="domcontentloaded", timeout=self.GOTO_TIMEOUT_MS)
+      page.goto(url, wait_until="commit", timeout=self.GOTO_TIMEOUT_MS)
     except PlaywrightTimeoutError:
       logger.warning(
         _t(
           self.lang,
-          "goto 日视图时 DOMContentLoaded 超时，可能网络较慢，但尝试继续。",
-          "DOMContentLoaded timed out when opening day view; network may be slow, continuing.",
+          "goto 日视图超时，可能网络较慢，但尝试继续。",
+          "Timed out opening day view; network may be slow, continuing.",
         )
       )
 
-    # 等资源加载，如果 networkidle 达不到就忽略
     try:
-      page.wait_for_load_state("networkidle", timeout=10_000)
+      page.wait_for_selector(DAY_VIEW_READY_SELECTOR, timeout=self.DAY_VIEW_READY_TIMEOUT_MS)
     except PlaywrightTimeoutError:
-      logger.debug(
+      logger.warning(
         _t(
           self.lang,
-          "日视图未达到 networkidle，忽略该错误，继续执行。",
-          "Day view did not reach networkidle; ignoring and continuing.",
+          "日视图网格未出现，冲突检测可能不完整，继续执行。",
+          "Day view grid did not appear; conflict detection may be incomplete, continuing.",
         )
       )
 
-    # 额外，日历 UI 渲染完
-    page.wait_for_timeout(self.SMALL_WAIT_MS)
-
   def _detect_conflict(self, page: Page, cmd: CalendarCommand) -> bool:
     target_start = datetime.combine(cmd.date, cmd.start_time)
     target_end = datetime.combine(cmd.date, cmd.end_time)
 
-    event_buttons = page.query_selector_all('div[role="button"][data-eventchip]')
+    labels: list[str] = page.evaluate(_EVENT_LABELS_JS)
     logger.info(
       _t(self.lang, "本日视图中检测到 %d 个事件候选节点", "Detected %d candidate events in day view"),
-      len(event_buttons),
+      len(labels),
     )
 
-    for btn in event_buttons:
-      try:
-        info = btn.query_selector('.XuJrye')
-        if info:
-          label = info.inner_text().strip()
-        else:
-          # fallback：整个按钮的文本
-          label = btn.inner_text().strip()
-      except PlaywrightError:
-        continue
-
-      if not label:
-        continue
-
-      parsed = _parse_event_time_from_label(label, target_start)
+    for label in labels:
+      parsed = parse_event_time_from_label(label, target_start)
       if not parsed:
         continue
 
@@ -550,24 +528,9 @@ class GoogleCalendarAgent:
       page.wait_for_timeout(200)
 
     # 日期输入框
-    start_date_input = None
-    end_date_input = None
-
-    possible_start_date_labels = ["Start date", "开始日期"]
-    possible_end_date_labels = ["End date", "结束日期"]
-
-    for label in possible_start_date_labels:
-      loc = page.locator(f'input[aria-label="{label}"]')
-      if loc.count() > 0:
-        start_date_input = loc.first
-        break
-
-    for label in possible_end_date_labels:
-      loc = page.locator(f'input[aria-label="{label}"]')
-      if loc.count() > 0:
-        end_date_input = loc.first
-        break
-    
+    start_date_input = self._first_attached(page.locator(_START_DATE_INPUT))
+    end_date_input = self._first_attached(page.locator(_END_DATE_INPUT))
+
     date_format = "%m/%d/%Y" if self.lang == "en" else "%Y/%m/%d"
     date_str = cmd.date.strftime(date_format)
 
@@ -590,23 +553,8 @@ class GoogleCalendarAgent:
       logger.warning(_t(self.lang, "未找到结束日期输入框，可能沿用默认日期。", "End date input not found; default date may be used."))
 
     # 时间输入框
-    start_time_input = None
-    end_time_input = None
-
-    possible_start_time_labels = ["Start time", "开始时间"]
-    possible_end_time_labels = ["End time", "结束时间"]
-
-    for label in possible_start_time_labels:
-      loc = page.locator(f'input[aria-label="{label}"]')
-      if loc.count() > 0:
-        start_time_input = loc.first
-        break
-
-    for label in possible_end_time_labels:
-      loc = page.locator(f'input[aria-label="{label}"]')
-      if loc.count() > 0:
-        end_time_input = loc.first
-        break
+    start_time_input = self._first_attached(page.locator(_START_TIME_INPUT))
+    end_time_input = self._first_attached(page.locator(_END_TIME_INPUT))
 
     start_time_str = cmd.start_time.strftime("%H:%M")
     end_time_str = cmd.end_time.strftime("%H:%M")
@@ -629,20 +577,10 @@ class GoogleCalendarAgent:
       fill_and_confirm(end_date_input, date_str)
 
     # 保存按钮
-    save_button = None
-
-    for label in ("Save", "保存"):
-      loc = page.get_by_role("button", name=label)
-      if loc.count() > 0:
-        save_button = loc.first
-        break
-
-    if not save_button:
-      for text in ("Save", "保存"):
-        loc = page.get_by_text(text, exact=False)
-        if loc.count() > 0:
-          save_button = loc.first
-          break
+    save_button = (
+      self._first_attached(page.get_by_role("button", name=_SAVE_BUTTON_RE))
+      or self._first_attached(page.get_by_text(_SAVE_TEXT_RE))
+    )
 
     if not save_button:
       logger.error(_t(self.lang, "未找到保存按钮，可能按钮文案或结构有变化。", "Save button not found; label or structure may have changed."))
@@ -650,21 +588,29 @@ class GoogleCalendarAgent:
         _t(self.lang, "创建事件失败：无法定位保存按钮。", "Failed to create event: cannot locate Save button.")
       )
 
-    # 等待保存按钮可点击（有时需要离开输入框/关闭弹层）
-    for _ in range(20):
-      if save_button.is_enabled():
-        break
-      try:
-        page.keyboard.press("Escape")
-      except Exception:
-        pass
-      page.click("body", position={"x": 10, "y": 10})
-      page.wait_for_timeout(250)
-
-    save_button.click()
-    page.wait_for_timeout(self.SMALL_WAIT_MS)
+    # click 自带可操作性等待（可见、可用）；等不到时多半是输入框的下拉层挡着，按一次 Escape 再试
+    try:
+      save_button.click(timeout=self.SAVE_CLICK_TIMEOUT_MS)
+    except PlaywrightTimeoutError:
+      page.keyboard.press("Escape")
+      save_button.click(timeout=self.SAVE_CLICK_TIMEOUT_MS)
     logger.info(_t(self.lang, "已点击保存事件按钮", "Save button clicked"))
 
+    # 弹窗关闭即保存完成
+    try:
+      page.wait_for_selector('[role="dialog"]', state="hidden", timeout=self.SAVE_CLICK_TIMEOUT_MS)
+    except PlaywrightTimeoutError:
+      logger.warning(_t(self.lang, "保存后弹窗未关闭，继续执行。", "Dialog still open after saving; continuing."))
+
+  def _first_attached(self, locator: Locator) -> Optional[Locator]:
+    # 弹窗已经打开，字段一般立即可用；等不到就视为没有该字段
+    first = locator.first
+    try:
+      first.wait_for(state="attached", timeout=self.FIELD_WAIT_MS)
+    except PlaywrightTimeoutError:
+      return None
+    return first
+
   def _create_multi_day_event(self, page: Page, cmd: CalendarCommand) -> None:
     # undo: 跨多日
     return None
@@ -687,8 +633,8 @@ if __name__ == "__main__":
     title="测试：和 CEO 会议",
   )
 
-  agent = GoogleCalendarAgent()
-  result = agent.check_and_create_event(test_cmd)
+  with GoogleCalendarAgent() as agent:
+    result = agent.check_and_create_event(test_cmd)
 
   print("=== CalendarResult ===")
   print("success:", result.success)
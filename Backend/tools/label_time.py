@@ -0,0 +1,112 @@
+"""从 Google Calendar 事件 label 里解析起止时间（不依赖 Playwright，便于单独测试）。"""
+
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional, Tuple
+
+# 预编译：冲突检测时每个事件都要解析一次 label
+# 中文："下午10点 - 下午11点"、"下午10:00 - 下午11:30"、"10点30分"
+_ZH_RANGE = (
+  r'(上午|下午)\s*' # period1: 上午/下午
+  r'(\d{1,2})' # h1
+  r'(?:[:：](\d{1,2}))?' # :mm，可选
+  r'(?:点)?'
+  r'(?:\s*(\d{1,2})分)?' # 兼容 “10点30分”
+  r'\s*[-–－—~～至到 ]+\s*' # 连接符：-、–、至、到 等
+  r'(上午|下午)?\s*' # period2：省略则复用前一个
+  r'(\d{1,2})' # h2
+  r'(?:[:：](\d{1,2}))?'
+  r'(?:点)?'
+  r'(?:\s*(\d{1,2})分)?'
+)
+# 10am to 11am（只有这一支忽略大小写，省掉整串 lower()）
+_EN_AMPM = (
+  r'(?i:(\d{1,2})(?::(\d{2}))?\s*(am|pm)\s*(?:to|–|-|—)\s*'
+  r'(\d{1,2})(?::(\d{2}))?\s*(am|pm)?)'
+)
+# 10:00 – 11:30
+_EN_HHMM = r'(\d{1,2}:\d{2})\s*[–\-－—]\s*(\d{1,2}:\d{2})'
+# 三种格式合成一个正则，一次扫描即可分类；按 lastgroup 分派，取该分支自己的捕获组
+# label 里同时出现多种格式时取最靠左的一处（Calendar 总把事件时间放在 label 开头）
+_LABEL_TIME_RE = re.compile(f"(?P<zh>{_ZH_RANGE})|(?P<ampm>{_EN_AMPM})|(?P<hhmm>{_EN_HHMM})")
+_LABEL_TIME_GROUPS = {
+  name: slice(_LABEL_TIME_RE.groupindex[name], _LABEL_TIME_RE.groupindex[name] + re.compile(pattern).groups)
+  for name, pattern in (("zh", _ZH_RANGE), ("ampm", _EN_AMPM), ("hhmm", _EN_HHMM))
+}
+
+def _zh_to_24h(
+  period: str,
+  h: str,
+  m_colon: Optional[str],
+  m_fen: Optional[str],
+) -> Tuple[int, int]:
+  hour = int(h)
+  if m_colon is not None:
+    minute = int(m_colon)
+  elif m_fen is not None:
+    minute = int(m_fen)
+  else:
+    minute = 0
+
+  if period == "上午":
+    if hour == 12:
+      hour = 0
+  elif period == "下午":
+    if hour < 12:
+      hour += 12
+  return hour, minute
+
+def _ampm_to_24h(h: str, m: Optional[str], ap: str) -> Tuple[int, int]:
+  hour = int(h)
+  minute = int(m) if m else 0
+  if ap == "pm" and hour < 12:
+    hour += 12
+  if ap == "am" and hour == 12:
+    hour = 0
+  return hour, minute
+
+def _hhmm(time_str: str) -> Tuple[int, int]:
+  h, m = time_str.split(":")
+  return int(h), int(m)
+
+# 解析结果只取决于 label 本身，与日期无关；同一天的日程在重复检查时直接命中
+@lru_cache(maxsize=2048)
+def parse_label_hours(text_raw: str) -> Optional[Tuple[int, int, int, int]]:
+  m = _LABEL_TIME_RE.search(text_raw)
+  if m is None:
+    return None
+  kind = m.lastgroup
+  groups = m.groups()[_LABEL_TIME_GROUPS[kind]]
+
+  if kind == "zh":
+    period1, h1, m1_colon, m1_fen, period2, h2, m2_colon, m2_fen = groups
+    if period2 is None:
+      period2 = period1
+    return _zh_to_24h(period1, h1, m1_colon, m1_fen) + _zh_to_24h(period2, h2, m2_colon, m2_fen)
+  if kind == "ampm":
+    h1, m1, ap1, h2, m2, ap2 = groups
+    ap1 = ap1.lower()
+    ap2 = ap2.lower() if ap2 is not None else ap1
+    return _ampm_to_24h(h1, m1, ap1) + _ampm_to_24h(h2, m2, ap2)
+  start_str, end_str = groups
+  return _hhmm(start_str) + _hhmm(end_str)
+
+def parse_event_time_from_label(
+  label: str, event_date: datetime
+) -> Optional[Tuple[datetime, datetime]]:
+  """
+    英文：
+    - "10am to 11am, 测试：和 CEO 会议, Jayden Liu, ..."
+    - "10:00 – 11:30"
+    中文：
+    - "下午10点 - 下午11点，111111，Jayden Liu，没有地点信息，2025年11月28日"
+    - "下午10:00 - 下午11:30，..."
+  """
+  hours = parse_label_hours(label.strip())
+  if hours is None:
+    return None
+  sh, sm, eh, em = hours
+  start = event_date.replace(hour=sh, minute=sm, second=0, microsecond=0)
+  end = event_date.replace(hour=eh, minute=em, second=0, microsecond=0)
+  return start, end
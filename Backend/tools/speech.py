@@ -1,6 +1,8 @@
+import io
 import os
 import re
-import tempfile
+import wave
+from typing import AsyncIterator, BinaryIO
 
 import edge_tts
 from edge_tts.exceptions import NoAudioReceived, UnexpectedResponse, WebSocketError
@@ -29,10 +31,11 @@ def _normalize_lang(lang: str) -> str:
   return "en" if lang.startswith("en") else "zh"
 
 
-def transcribe_audio(path: str, lang: str = "zh") -> str:
+def transcribe_audio(source: str | BinaryIO, lang: str = "zh") -> str:
+  """Transcribe a file path or an in-memory file object (the container is sniffed from its bytes)."""
   normalized = _normalize_lang(lang)
   segments, _ = _model.transcribe(
-    path,
+    source,
     language=normalized,
     beam_size=STT_BEAM_SIZE,
     best_of=STT_BEST_OF,
@@ -45,17 +48,19 @@ def transcribe_audio(path: str, lang: str = "zh") -> str:
   return text.strip()
 
 
-def transcribe_audio_bytes(audio_bytes: bytes, lang: str = "zh", suffix: str = ".webm") -> str:
-  with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
-    f.write(audio_bytes)
-    tmp_path = f.name
-  try:
-    return transcribe_audio(tmp_path, lang=lang)
-  finally:
-    try:
-      os.remove(tmp_path)
-    except Exception:
-      pass
+def transcribe_audio_bytes(audio_bytes: bytes, lang: str = "zh") -> str:
+  return transcribe_audio(io.BytesIO(audio_bytes), lang=lang)
+
+
+def pcm16_to_wav(pcm: bytes, sample_rate: int = 16000) -> bytes:
+  """Wrap raw mono s16le audio in a WAV header so the decoder can read it."""
+  out = io.BytesIO()
+  with wave.open(out, "wb") as wav:
+    wav.setnchannels(1)
+    wav.setsampwidth(2)
+    wav.setframerate(sample_rate)
+    wav.writeframes(pcm)
+  return out.getvalue()
 
 
 def common_prefix_length(left: str, right: str) -> int:
@@ -74,6 +79,24 @@ def delta_from_previous(previous: str, current: str) -> str:
   return current[common_prefix_length(previous, current):]
 
 
+def stitch_transcript(committed: str, tail: str, min_overlap: int = 2) -> str:
+  """Join a committed transcript with the text of a later window that re-heard its last words."""
+  committed = committed.strip()
+  tail = tail.strip()
+  if not committed:
+    return tail
+  if not tail:
+    return committed
+  for size in range(min(len(committed), len(tail)), min_overlap - 1, -1):
+    if committed.endswith(tail[:size]):
+      tail = tail[size:].lstrip()
+      break
+  if not tail:
+    return committed
+  sep = " " if committed[-1].isascii() and tail[0].isascii() and tail[0].isalnum() else ""
+  return committed + sep + tail
+
+
 # TTS
 VOICE_NAME = "zh-CN-XiaoxiaoNeural"
 VOICE_BY_LANG = {
@@ -135,21 +158,55 @@ def segment_tts_text(
   return [seg for seg in segments if seg]
 
 
-async def synthesize_speech(text: str, lang: str = "zh") -> bytes:
+def _voice_candidates(lang: str) -> list[str]:
   normalized = _normalize_lang(lang)
   primary_voice = VOICE_BY_LANG.get(normalized, VOICE_NAME)
-  voices = [primary_voice] + [v for v in VOICE_FALLBACKS.get(normalized, []) if v != primary_voice]
+  return [primary_voice] + [v for v in VOICE_FALLBACKS.get(normalized, []) if v != primary_voice]
+
+
+def _communicate(text: str, voice: str) -> edge_tts.Communicate:
+  return edge_tts.Communicate(
+    text,
+    voice,
+    proxy=PROXY,
+    connect_timeout=CONNECT_TIMEOUT,
+    receive_timeout=RECEIVE_TIMEOUT,
+  )
+
+
+async def synthesize_speech_stream(text: str, lang: str = "zh") -> AsyncIterator[bytes]:
+  """Yield MP3 bytes as edge-tts produces them.
+
+  Fallback voices are only tried before the first byte; once audio has been yielded,
+  a failure is raised because another voice cannot resume the same clip.
+  """
+  last_error = None
+  for voice in _voice_candidates(lang):
+    started = False
+    try:
+      async for chunk in _communicate(text, voice).stream():
+        if chunk["type"] == "audio" and chunk["data"]:
+          started = True
+          yield chunk["data"]
+      if started:
+        return
+      last_error = NoAudioReceived("No audio was received.")
+    except Exception as e:
+      if started:
+        raise
+      last_error = e
+
+  if last_error:
+    raise last_error
+  raise NoAudioReceived("No audio was received.")
+
+
+async def synthesize_speech(text: str, lang: str = "zh") -> bytes:
   last_error = None
 
-  for voice in voices:
+  for voice in _voice_candidates(lang):
     try:
-      communicate = edge_tts.Communicate(
-        text,
-        voice,
-        proxy=PROXY,
-        connect_timeout=CONNECT_TIMEOUT,
-        receive_timeout=RECEIVE_TIMEOUT,
-      )
+      communicate = _communicate(text, voice)
       audio_bytes = bytearray()
       async for chunk in communicate.stream():
         if chunk["type"] == "audio":
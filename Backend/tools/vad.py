@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+
+try:
+  import webrtcvad
+except ImportError:  # optional; PCM streams fall back to a per-frame RMS threshold
+  webrtcvad = None
+
+try:
+  from numba import njit
+except ImportError:  # optional speedup for the RMS scanner
+  njit = None
+
+# Server-side VAD only works on raw 16 kHz mono s16le audio
+PCM_SAMPLE_RATE = 16000
+VAD_FRAME_MS = 20
+VAD_FRAME_SAMPLES = PCM_SAMPLE_RATE * VAD_FRAME_MS // 1000
+VAD_FRAME_BYTES = VAD_FRAME_SAMPLES * 2
+VAD_AGGRESSIVENESS = int(os.getenv("STREAM_VAD_AGGRESSIVENESS", "2"))
+VAD_ENERGY_THRESHOLD = float(os.getenv("STREAM_STT_ENERGY_THRESHOLD", "0.02"))
+
+_vad = webrtcvad.Vad(VAD_AGGRESSIVENESS) if webrtcvad is not None else None
+
+
+def webrtc_vad_available() -> bool:
+  return _vad is not None
+
+
+def _rms_flags_numpy(samples: np.ndarray, frame_samples: int, threshold: float) -> np.ndarray:
+  frames = samples.reshape(-1, frame_samples).astype(np.float32) / 32768.0
+  return np.sqrt(np.mean(frames * frames, axis=1)) >= threshold
+
+
+if njit is not None:
+  @njit(cache=True, fastmath=True)
+  def _rms_flags(samples, frame_samples, threshold):
+    n_frames = samples.shape[0] // frame_samples
+    flags = np.zeros(n_frames, dtype=np.bool_)
+    limit = threshold * threshold * 32768.0 * 32768.0 * frame_samples
+    for frame in range(n_frames):
+      total = 0.0
+      base = frame * frame_samples
+      for idx in range(frame_samples):
+        value = float(samples[base + idx])
+        total += value * value
+      flags[frame] = total >= limit
+    return flags
+else:
+  _rms_flags = _rms_flags_numpy
+
+
+def scan_voiced_frames(pcm: bytes | bytearray | memoryview, start: int) -> tuple[list[bool], int]:
+  """Classify every whole 20 ms frame from `start`; returns the flags and the offset to resume from."""
+  view = memoryview(pcm)
+  end = start + (len(view) - start) // VAD_FRAME_BYTES * VAD_FRAME_BYTES
+  if end == start:
+    return [], start
+  if _vad is not None:
+    flags = [
+      _vad.is_speech(bytes(view[offset:offset + VAD_FRAME_BYTES]), PCM_SAMPLE_RATE)
+      for offset in range(start, end, VAD_FRAME_BYTES)
+    ]
+    return flags, end
+  samples = np.frombuffer(view[start:end], dtype="<i2")
+  return _rms_flags(samples, VAD_FRAME_SAMPLES, VAD_ENERGY_THRESHOLD).tolist(), end
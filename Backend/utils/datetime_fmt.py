@@ -0,0 +1,52 @@
+"""Normalisers for the date/time strings the LLM extractors emit."""
+
+import re
+from datetime import date, time
+
+_ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+# H:MM[:SS] (24h) or H[:MM] am/pm (12h), matching the formats the LLM tends to emit
+_TIME_RE = re.compile(r"^\s*(\d{1,2})(?::(\d{1,2}))?(?::(\d{1,2}))?\s*([AaPp][Mm])?\s*$")
+
+
+def is_iso_date(value: str) -> bool:
+    """True for a valid zero-padded YYYY-MM-DD (regex gate plus C-level range check)."""
+    if not _ISO_DATE.fullmatch(value):
+        return False
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def normalise_time(value: str) -> str:
+    """Ensure a time value is in HH:MM 24-hour format; unrecognised values pass through unchanged."""
+    if not value:
+        return ""
+    m = _TIME_RE.match(value)
+    if not m:
+        return value
+    h, mi, sec, ampm = m.groups()
+    hour = int(h)
+    minute = int(mi or 0)
+    if minute > 59:
+        return value
+    if ampm:
+        if sec is not None or not 1 <= hour <= 12:
+            return value
+        hour = hour % 12 + (12 if ampm.lower() == "pm" else 0)
+    elif mi is None or hour > 23 or (sec is not None and int(sec) > 61):
+        return value
+    return f"{hour:02d}:{minute:02d}"
+
+
+def fast_date(value: str) -> date:
+    """Parse Y-M-D, padded or not, without the locale-aware strptime machinery."""
+    y, m, d = value.split("-")
+    return date(int(y), int(m), int(d))
+
+
+def fast_hm(value: str) -> time:
+    """Parse H:MM, padded or not, without strptime."""
+    h, mm = value.split(":")
+    return time(int(h), int(mm))